@@ -1,16 +1,43 @@
-from huggingface_hub import InferenceClient
 import json
+import time
 
-def get_ai_response(user_prompt, api_key=None, complexity="Working Code", model="Qwen/Qwen2.5-Coder-32B-Instruct"):
+from app.inference import get_backend, call_with_retry
+from app.planner import plan_generation, plan_file, continuation_messages, join_continuation
+from app.tracing import span
+
+DEFAULT_MODEL = "Qwen/Qwen2.5-Coder-32B-Instruct"
+
+# Bump whenever the prompt below changes, so cached blueprints from the old prompt are not reused.
+PROMPT_VERSION = "5.2-oneshot"
+
+# Output protocols: one nested JSON object, or one JSON record per file and line
+PROTOCOL_JSON = "JSON Tree"
+PROTOCOL_RECORDS = "Line Records"
+PROTOCOLS = [PROTOCOL_JSON, PROTOCOL_RECORDS]
+
+
+# Errors tied to the caller's API key rather than to the request
+NO_API_KEY = "No API Key provided. Please check your Settings."
+INVALID_API_KEY = "Invalid API Key, or it has no access to this model. Please check your Settings."
+
+
+class InferenceError(Exception):
+    """Raised by stream_ai_response when the model call fails (the message is user-facing)."""
+
+
+def prompt_version(protocol=PROTOCOL_JSON):
     """
-    Uses the official huggingface_hub client with a strict One-Shot Prompt.
+    Cache-key version for a protocol (JSON keeps the plain PROMPT_VERSION, so existing entries stay valid).
+    """
+    return PROMPT_VERSION if protocol == PROTOCOL_JSON else f"{PROMPT_VERSION}+records-1"
+
+def _build_messages(user_prompt, complexity, context=None, protocol=PROTOCOL_JSON):
+    """
+    Builds the strict One-Shot chat messages shared by every generation mode.
+    `context` is appended to the request (e.g. the existing tree when regenerating a folder).
     """
-    
-    # 1. Validate API Key
-    if not api_key:
-        return json.dumps({"error": "No API Key provided. Please check your Settings."})
 
-    # 2. Strict One-Shot Example (The Fix)
+    # 1. Strict One-Shot Example (The Fix)
     # We show the AI exactly what we want so it stops being lazy.
     example_json = """
     {
@@ -38,6 +65,29 @@ def get_ai_response(user_prompt, api_key=None, complexity="Working Code", model=
     {example_json}
     """
 
+    if protocol == PROTOCOL_RECORDS:
+        # One self-contained record per line: a cut-off response still yields every finished file
+        example_records = """
+    {"path": "my_project/app.py", "content": "print('hello world')"}
+    {"path": "my_project/requirements.txt", "content": "flask"}
+    {"path": "my_project/utils/helper.py", "content": "def add(a,b):\\n    return a+b"}
+    {"done": true}
+    """
+        base_instruction = f"""
+    You are an expert Software Architect.
+    You MUST output the project as LINE RECORDS: one JSON object per line, one line per file.
+    
+    RULES:
+    1. Each line is {{"path": "<project>/<folders>/<file>", "content": "<file content>"}}.
+    2. Escape newlines in the content as \\n so every record stays on ONE line.
+    3. Use forward slashes. The first path segment is the project folder name.
+    4. After the last file, output {{"done": true}} on its own line.
+    5. Do not include markdown formatting or explanations. Just the records.
+    
+    EXAMPLE OUTPUT:
+    {example_records}
+    """
+
     if complexity == "Structure Only":
         role_msg = "Create a deep folder structure with empty strings for file content."
     elif complexity == "Simple Code":
@@ -45,29 +95,241 @@ def get_ai_response(user_prompt, api_key=None, complexity="Working Code", model=
     else:
         role_msg = "Create a production-ready structure. File content must be FULL, working code with imports."
 
-    # 3. Create Client
-    client = InferenceClient(token=api_key)
+    return [
+        {"role": "system", "content": base_instruction},
+        {"role": "user", "content": f"{role_msg}\n\nRequest: {user_prompt}" + (f"\n\n{context}" if context else "")}
+    ]
+
+def _build_file_messages(user_prompt, file_path, project_paths, complexity, instructions=None):
+    """
+    Builds the messages that ask for the content of ONE file of an existing skeleton.
+    """
+    if complexity == "Simple Code":
+        role_msg = "Write short comments or class skeletons only."
+    else:
+        role_msg = "Write FULL, working, production-ready code with imports."
+
+    tree_listing = "\n".join(project_paths)
+    base_instruction = f"""
+    You are an expert Software Architect writing one file of a larger project.
+    
+    RULES:
+    1. Output ONLY the raw content of the requested file.
+    2. Do not wrap it in markdown fences or add explanations.
+    3. Stay consistent with the other files in the project tree (imports, names).
+    
+    PROJECT TREE:
+    {tree_listing}
+    """
+
+    return [
+        {"role": "system", "content": base_instruction},
+        {"role": "user", "content": f"{role_msg}\n\nProject: {user_prompt}\n\nFile: {file_path}"
+                                    + (f"\n\nChange request: {instructions}" if instructions else "")}
+    ]
+
+def _error_message(error_msg, model):
+    """
+    Turns a raw client exception message into the message shown to the user.
+    """
+    if "503" in error_msg:
+        return "The AI model is still loading (Cold Start) after several retries. Please try again in a minute."
+    elif "404" in error_msg:
+        return f"Model '{model}' not found. Try switching to 'google/gemma-2-9b-it'."
+    elif "401" in error_msg or "403" in error_msg:
+        return INVALID_API_KEY
+    else:
+        return f"Connection Error: {error_msg}"
+
+def _format_error(error_msg, model):
+    """
+    Turns a raw client exception message into the JSON error payload the UI expects.
+    """
+    return json.dumps({"error": _error_message(error_msg, model)})
+
+def is_credential_error(message):
+    """
+    True if an error message (see _error_message) comes from a missing or rejected API key,
+    i.e. the same request may well succeed with another key.
+    """
+    return message in (NO_API_KEY, INVALID_API_KEY)
 
+def extract_error(raw_text):
+    """
+    Returns the message of an error payload produced by this module, or None.
+    """
     try:
-        # 4. Chat Completion
-        response = client.chat_completion(
-            model=model,
-            messages=[
-                {"role": "system", "content": base_instruction},
-                {"role": "user", "content": f"{role_msg}\n\nRequest: {user_prompt}"}
-            ],
-            max_tokens=3000, # Increased token limit for deeper trees
-            temperature=0.1, # Lower temperature = More strict/deterministic
-            stream=False
-        )
-        
-        return response.choices[0].message.content
-
-    except Exception as e:
-        error_msg = str(e)
-        if "503" in error_msg:
-            return json.dumps({"error": "The AI model is loading (Cold Start). Please wait 30s and try again."})
-        elif "404" in error_msg:
-             return json.dumps({"error": f"Model '{model}' not found. Try switching to 'google/gemma-2-9b-it'."})
-        else:
-            return json.dumps({"error": f"Connection Error: {error_msg}"})
\ No newline at end of file
+        payload = json.loads(raw_text)
+    except (json.JSONDecodeError, TypeError):
+        return None
+    if isinstance(payload, dict) and set(payload) == {"error"}:
+        return payload["error"]
+    return None
+
+def get_ai_response(user_prompt, api_key=None, complexity="Working Code", model=DEFAULT_MODEL, usage=None, context=None,
+                    protocol=PROTOCOL_JSON):
+    """
+    Uses the pooled huggingface_hub backend with a strict One-Shot Prompt.
+    Cold starts (503) and rate limits (429) are retried with backoff before giving up.
+    If a dict is passed as `usage`, it is filled with the token counts of the call.
+    `context` is extra text appended to the request (see pipeline.regenerate_paths).
+    max_tokens and (for the "auto" model) the model come from planner.plan_generation;
+    a response cut off by max_tokens is continued up to plan.max_continuations times.
+    `protocol` selects the output format (PROTOCOL_JSON or PROTOCOL_RECORDS).
+    """
+    
+    # 1. Validate API Key
+    if not api_key:
+        return json.dumps({"error": NO_API_KEY})
+
+    backend = get_backend()
+    messages = _build_messages(user_prompt, complexity, context, protocol)
+    plan = plan_generation(user_prompt, complexity, model)
+    model = plan.model
+
+    with span("inference", model=model, max_tokens=plan.max_tokens, bytes_out=sum(len(m["content"]) for m in messages)) as trace:
+        try:
+            content = ""
+            prompt_tokens = completion_tokens = 0
+            for attempt in range(plan.max_continuations + 1):
+                # 2. Chat Completion (pooled client + retry)
+                response = backend.run(backend.chat_completion(
+                    continuation_messages(messages, content) if attempt else messages,
+                    api_key,
+                    model,
+                    max_tokens=plan.max_tokens,
+                    temperature=0.1  # Lower temperature = More strict/deterministic
+                ))
+
+                choice = response.choices[0]
+                content = join_continuation(content, choice.message.content)
+                if response.usage:
+                    prompt_tokens += response.usage.prompt_tokens
+                    completion_tokens += response.usage.completion_tokens
+
+                # 3. Cut off by max_tokens: ask for the rest
+                if choice.finish_reason != "length":
+                    break
+
+            trace.set(continuations=attempt, prompt_tokens=prompt_tokens, completion_tokens=completion_tokens,
+                      bytes_in=len(content))
+            if usage is not None:
+                usage["prompt_tokens"] = prompt_tokens
+                usage["completion_tokens"] = completion_tokens
+                usage["continuations"] = attempt
+            
+            return content
+
+        except Exception as e:
+            trace.set(error=str(e)[:200])
+            return _format_error(str(e), model)
+
+def stream_ai_response(user_prompt, api_key=None, complexity="Working Code", model=DEFAULT_MODEL, protocol=PROTOCOL_JSON):
+    """
+    Streaming variant of get_ai_response.
+    Yields raw text chunks as the model produces them, so the caller can
+    feed them into utils.StreamingTreeParser and show files as they finish.
+    With PROTOCOL_RECORDS, feed them into utils.RecordStreamParser instead.
+    Errors raise InferenceError (possibly after some chunks were yielded), so an
+    error message never ends up inside the model text.
+    Truncated streams are continued the same way as in get_ai_response.
+    """
+
+    # 1. Validate API Key
+    if not api_key:
+        raise InferenceError(NO_API_KEY)
+
+    # 2. Pooled Client
+    plan = plan_generation(user_prompt, complexity, model)
+    model = plan.model
+    client = get_backend().sync_client(api_key, model)
+    messages = _build_messages(user_prompt, complexity, protocol=protocol)
+
+    with span("inference_stream", model=model, max_tokens=plan.max_tokens, bytes_out=sum(len(m["content"]) for m in messages)) as trace:
+        start = time.perf_counter()
+        received = 0
+        content = ""
+        try:
+            for attempt in range(plan.max_continuations + 1):
+                # 3. Chat Completion (Token Stream). Opening the stream is retried on 503/429.
+                request = continuation_messages(messages, content) if attempt else messages
+                stream = call_with_retry(lambda: client.chat_completion(
+                    messages=request,
+                    max_tokens=plan.max_tokens,
+                    temperature=0.1,
+                    stream=True
+                ))
+
+                finish_reason = None
+                # A continuation may reopen a code fence: hold its first line back until it can be dropped
+                pending = "" if attempt else None
+                for chunk in stream:
+                    if not chunk.choices:
+                        continue
+                    finish_reason = chunk.choices[0].finish_reason or finish_reason
+                    delta = chunk.choices[0].delta.content
+                    if not delta:
+                        continue
+                    if pending is not None:
+                        pending += delta
+                        stripped = pending.lstrip()
+                        if not stripped or (stripped.startswith("`") and "\n" not in stripped):
+                            continue
+                        delta, pending = join_continuation("", pending), None
+                        if not delta:
+                            continue
+                    if not received:
+                        trace.set(first_token_s=round(time.perf_counter() - start, 3))
+                    content += delta
+                    received += len(delta)
+                    yield delta
+
+                # 4. Cut off by max_tokens: stream the rest
+                if finish_reason != "length":
+                    break
+            trace.set(continuations=attempt)
+
+        except Exception as e:
+            trace.set(error=str(e)[:200])
+            raise InferenceError(_error_message(str(e), model)) from e
+        finally:
+            trace.set(bytes_in=received)
+
+async def aget_file_response(user_prompt, file_path, project_paths, api_key=None, complexity="Working Code", model=DEFAULT_MODEL, instructions=None):
+    """
+    Generates the content of a single file, given the full project tree as context.
+    Must be awaited on the inference backend loop (see inference.InferenceBackend.run).
+    Returns the raw model text, or a JSON error payload (same format as get_ai_response).
+    """
+
+    # 1. Validate API Key
+    if not api_key:
+        return json.dumps({"error": NO_API_KEY})
+
+    model, max_tokens = plan_file(complexity, model)
+    with span("file_inference", model=model, path=file_path) as trace:
+        try:
+            # 2. Chat Completion (one file only, so a smaller budget is enough)
+            response = await get_backend().chat_completion(
+                _build_file_messages(user_prompt, file_path, project_paths, complexity, instructions),
+                api_key,
+                model,
+                max_tokens=max_tokens,
+                temperature=0.1
+            )
+
+            content = response.choices[0].message.content
+            trace.set(bytes_in=len(content or ""))
+            return content
+
+        except Exception as e:
+            trace.set(error=str(e)[:200])
+            return _format_error(str(e), model)
+
+def get_file_response(user_prompt, file_path, project_paths, api_key=None, complexity="Working Code", model=DEFAULT_MODEL, instructions=None):
+    """
+    Blocking wrapper around aget_file_response.
+    """
+    return get_backend().run(aget_file_response(
+        user_prompt, file_path, project_paths, api_key=api_key, complexity=complexity, model=model, instructions=instructions
+    ))
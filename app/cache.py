@@ -0,0 +1,125 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+from app.shared import process_singleton
+
+DEFAULT_CACHE_DIR = os.environ.get("AI_ARCHITECT_CACHE_DIR", ".cache")
+
+def make_cache_key(user_prompt, complexity, model, prompt_version):
+    """
+    Content-addressed key for a generation request.
+    Prompts are normalized (case and whitespace) so trivial edits still hit.
+    """
+    normalized = " ".join(user_prompt.casefold().split())
+    material = json.dumps([normalized, complexity, model, prompt_version])
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Two-tier cache of parsed blueprints (the flattened dict from parse_ai_response).
+    1. In-memory LRU for the current process
+    2. SQLite file on disk, shared across sessions, with TTL and size-based eviction
+    """
+
+    def __init__(self, path=None, memory_items=64, max_disk_bytes=256 * 1024 * 1024, ttl_seconds=7 * 24 * 3600):
+        self.memory_items = memory_items
+        self.max_disk_bytes = max_disk_bytes
+        self.ttl_seconds = ttl_seconds
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+
+        if path is None:
+            os.makedirs(DEFAULT_CACHE_DIR, exist_ok=True)
+            path = os.path.join(DEFAULT_CACHE_DIR, "blueprints.sqlite3")
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS blueprints ("
+            "key TEXT PRIMARY KEY, payload BLOB, size INTEGER, created REAL, accessed REAL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS blueprints_accessed ON blueprints (accessed)")
+        self._db.commit()
+
+    def get(self, key):
+        """
+        Returns the cached flattened file dict, or None on a miss.
+        """
+        now = time.time()
+        with self._lock:
+            # 1. Memory tier
+            entry = self._memory.get(key)
+            if entry is not None:
+                created, files = entry
+                if now - created <= self.ttl_seconds:
+                    self._memory.move_to_end(key)
+                    return dict(files)
+                del self._memory[key]
+
+            # 2. Disk tier
+            row = self._db.execute(
+                "SELECT payload, created FROM blueprints WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            payload, created = row
+            if now - created > self.ttl_seconds:
+                self._db.execute("DELETE FROM blueprints WHERE key = ?", (key,))
+                self._db.commit()
+                return None
+
+            self._db.execute("UPDATE blueprints SET accessed = ? WHERE key = ?", (now, key))
+            self._db.commit()
+            files = json.loads(zlib.decompress(payload).decode("utf-8"))
+            self._remember(key, created, files)
+            return dict(files)
+
+    def set(self, key, files):
+        """
+        Stores a flattened file dict in both tiers, then evicts the least
+        recently used disk entries if the size budget is exceeded.
+        """
+        now = time.time()
+        payload = zlib.compress(json.dumps(files).encode("utf-8"))
+        with self._lock:
+            self._remember(key, now, dict(files))
+            self._db.execute(
+                "INSERT OR REPLACE INTO blueprints (key, payload, size, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                (key, payload, len(payload), now, now)
+            )
+            self._evict(now)
+            self._db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._db.execute("DELETE FROM blueprints")
+            self._db.commit()
+
+    def _remember(self, key, created, files):
+        self._memory[key] = (created, files)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def _evict(self, now):
+        self._db.execute("DELETE FROM blueprints WHERE created < ?", (now - self.ttl_seconds,))
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM blueprints").fetchone()[0]
+        if total <= self.max_disk_bytes:
+            return
+        # Drop the least recently used entries until we are back under budget
+        for key, size in self._db.execute("SELECT key, size FROM blueprints ORDER BY accessed").fetchall():
+            if total <= self.max_disk_bytes:
+                break
+            self._db.execute("DELETE FROM blueprints WHERE key = ?", (key,))
+            total -= size
+
+
+@process_singleton
+def get_default_cache():
+    return ResponseCache()
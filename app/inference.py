@@ -0,0 +1,168 @@
+import asyncio
+import random
+import threading
+import time
+
+from app.shared import process_singleton
+
+# 503 = model cold start, 429 = rate limited. Everything else fails fast.
+RETRY_STATUS_CODES = (429, 503)
+RETRY_DEADLINE_SECONDS = 120
+RETRY_BASE_DELAY = 1.0
+RETRY_MAX_DELAY = 20.0
+
+def status_code_of(error):
+    """
+    Best-effort HTTP status of a huggingface_hub exception.
+    """
+    response = getattr(error, "response", None)
+    code = getattr(response, "status_code", None)
+    if code is not None:
+        return code
+    message = str(error)
+    for code in RETRY_STATUS_CODES:
+        if str(code) in message:
+            return code
+    return None
+
+def backoff_delay(attempt):
+    """
+    Exponential backoff with full jitter: uniform(0, min(cap, base * 2^attempt)).
+    """
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt))
+
+def call_with_retry(fn, deadline=RETRY_DEADLINE_SECONDS):
+    """
+    Synchronous retry loop for calls that cannot go through the async backend (e.g. token streams).
+    """
+    start = time.monotonic()
+    attempt = 0
+    while True:
+        try:
+            return fn()
+        except Exception as e:
+            if status_code_of(e) not in RETRY_STATUS_CODES:
+                raise
+            delay = backoff_delay(attempt)
+            if time.monotonic() - start + delay > deadline:
+                raise
+            time.sleep(delay)
+            attempt += 1
+
+
+class InferenceBackend:
+    """
+    Pooled inference layer.
+    One background event loop owns one AsyncInferenceClient (and its HTTP
+    connection pool) per (token, model), so repeated calls skip connection
+    setup. Cold starts and rate limits are retried with jittered backoff.
+    """
+
+    def __init__(self):
+        self._loop = None
+        self._thread = None
+        self._async_clients = {}
+        self._sync_clients = {}
+        self._lock = threading.Lock()
+
+    # --- Event loop ---
+    def _ensure_loop(self):
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._loop.run_forever, name="inference-loop", daemon=True)
+                self._thread.start()
+            return self._loop
+
+    def submit(self, coro):
+        """
+        Schedules a coroutine on the backend loop and returns a concurrent.futures.Future.
+        """
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_loop())
+
+    def run(self, coro, timeout=None):
+        """
+        Runs a coroutine on the backend loop from any (non-async) thread and waits for it.
+        """
+        return self.submit(coro).result(timeout)
+
+    # --- Clients ---
+    def _async_client(self, api_key, model):
+        key = (api_key, model)
+        client = self._async_clients.get(key)
+        if client is None:
+            from huggingface_hub import AsyncInferenceClient  # Heavy import (~0.3s): deferred to first use
+            client = AsyncInferenceClient(model=model, token=api_key)
+            self._async_clients[key] = client
+        return client
+
+    def sync_client(self, api_key, model):
+        """
+        Pooled synchronous client, used for token streaming.
+        """
+        key = (api_key, model)
+        with self._lock:
+            client = self._sync_clients.get(key)
+            if client is None:
+                from huggingface_hub import InferenceClient
+                client = InferenceClient(model=model, token=api_key)
+                self._sync_clients[key] = client
+            return client
+
+    # --- Calls ---
+    async def chat_completion(self, messages, api_key, model, max_tokens=3000, temperature=0.1,
+                              deadline=RETRY_DEADLINE_SECONDS):
+        """
+        Non-streaming chat completion with retry on 503/429 until `deadline` seconds have passed.
+        Must be awaited on the backend loop (see run()).
+        """
+        client = self._async_client(api_key, model)
+        start = time.monotonic()
+        attempt = 0
+        while True:
+            try:
+                return await client.chat_completion(
+                    messages=messages,
+                    max_tokens=max_tokens,
+                    temperature=temperature,
+                    stream=False
+                )
+            except Exception as e:
+                if status_code_of(e) not in RETRY_STATUS_CODES:
+                    raise
+                delay = backoff_delay(attempt)
+                if time.monotonic() - start + delay > deadline:
+                    raise
+                await asyncio.sleep(delay)
+                attempt += 1
+
+    async def _ping(self, api_key, model):
+        try:
+            await self.chat_completion(
+                [{"role": "user", "content": "ping"}], api_key, model, max_tokens=1, temperature=0.0
+            )
+        except Exception:
+            pass
+
+    def warm_up(self, api_key, model):
+        """
+        Fire-and-forget one-token request so the model is loaded before the user generates.
+        """
+        return self.submit(self._ping(api_key, model))
+
+    def prewarm(self, api_key, model):
+        """
+        Fire-and-forget start-up work for a new session: imports huggingface_hub,
+        builds the pooled clients (streaming and async) and sends the warm-up
+        request, all off the caller's thread.
+        """
+        async def _prewarm():
+            await asyncio.to_thread(self.sync_client, api_key, model)
+            await self._ping(api_key, model)
+
+        return self.submit(_prewarm())
+
+
+@process_singleton
+def get_backend():
+    return InferenceBackend()
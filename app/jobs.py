@@ -0,0 +1,161 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from app.shared import process_singleton
+
+
+class JobCancelled(Exception):
+    """Raised inside a job function when its job was cancelled."""
+
+
+class JobLimitError(Exception):
+    """Raised by JobManager.submit when an owner already has too many active jobs."""
+
+
+class Job:
+    """
+    One unit of background work. Job functions receive the Job as their first
+    argument and may call report() to publish progress and check cancelled.
+    """
+
+    def __init__(self, owner):
+        self.id = uuid.uuid4().hex
+        self.owner = owner
+        self.status = "queued"     # queued | running | done | failed | cancelled
+        self.message = "Queued..."
+        self.items = []            # Progress items (e.g. finished file paths)
+        self.outputs = {}          # Partial output per item (e.g. file content), readable while running
+        self.result = None
+        self.error = None
+        self.trace = []            # Span breakdown, filled when tracing is enabled
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.cancel_event = threading.Event()
+        self._future = None
+
+    @property
+    def active(self):
+        return self.status in ("queued", "running")
+
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    def report(self, message=None, item=None, output=None):
+        if message is not None:
+            self.message = message
+        if item is not None:
+            if output is not None:
+                self.outputs[item] = output
+            self.items.append(item)
+
+
+class JobManager:
+    """
+    Thread-pool job queue with a global concurrency limit (max_workers) and a
+    per-owner limit on active jobs. Works without Streamlit, so the same
+    manager serves the Builder page and headless callers.
+    """
+
+    def __init__(self, max_workers=4, per_owner_limit=2, max_jobs_kept=500):
+        self.per_owner_limit = per_owner_limit
+        self.max_jobs_kept = max_jobs_kept
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, owner, fn, *args, **kwargs):
+        """
+        Queues fn(job, *args, **kwargs) and returns the job id.
+        """
+        with self._lock:
+            active = sum(1 for job in self._jobs.values() if job.owner == owner and job.active)
+            if active >= self.per_owner_limit:
+                raise JobLimitError(f"You already have {active} generation(s) running. Please wait or cancel one.")
+            job = Job(owner)
+            self._jobs[job.id] = job
+            self._prune()
+        job._future = self._executor.submit(self._run, job, fn, args, kwargs)
+        return job.id
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs(self, owner=None):
+        with self._lock:
+            return [job for job in self._jobs.values() if owner is None or job.owner == owner]
+
+    def cancel(self, job_id):
+        """
+        Requests cancellation. Queued jobs never start; running jobs stop at their next check.
+        """
+        job = self.get(job_id)
+        if job is None or not job.active:
+            return False
+        job.cancel_event.set()
+        if job._future is not None and job._future.cancel():
+            self._finish(job, "cancelled", message="Cancelled")
+        return True
+
+    def wait(self, job_id, timeout=None):
+        """
+        Blocks until the job is finished (headless use). Returns the Job.
+        """
+        job = self.get(job_id)
+        if job is not None and job._future is not None:
+            try:
+                job._future.result(timeout)
+            except Exception:
+                pass
+        return job
+
+    def shutdown(self, wait=True):
+        for job in self.jobs():
+            if job.active:
+                job.cancel_event.set()
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+    def _run(self, job, fn, args, kwargs):
+        if job.cancelled:
+            self._finish(job, "cancelled", message="Cancelled")
+            return
+        job.status = "running"
+        job.started = time.time()
+        job.message = "Running..."
+        try:
+            result = fn(job, *args, **kwargs)
+        except JobCancelled:
+            self._finish(job, "cancelled", message="Cancelled")
+        except Exception as e:
+            self._finish(job, "failed", error=str(e), message="Failed")
+        else:
+            if job.cancelled:
+                self._finish(job, "cancelled", message="Cancelled")
+            else:
+                self._finish(job, "done", result=result, message="Done")
+
+    def _finish(self, job, status, result=None, error=None, message=None):
+        job.result = result
+        job.error = error
+        if message is not None:
+            job.message = message
+        job.finished = time.time()
+        job.status = status
+
+    def _prune(self):
+        # Forget the oldest finished jobs once we keep too many
+        while len(self._jobs) > self.max_jobs_kept:
+            oldest = next((job_id for job_id, job in self._jobs.items() if not job.active), None)
+            if oldest is None:
+                break
+            del self._jobs[oldest]
+
+
+@process_singleton
+def get_job_manager():
+    return JobManager()
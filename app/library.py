@@ -0,0 +1,275 @@
+"""
+Persistent blueprint library, shared by every session and the batch CLI.
+
+Every successful blueprint is stored with its prompt, complexity, model and
+metadata. Two indexes make a close earlier blueprint findable instantly:
+
+1. Lexical: SQLite FTS5 over the prompt and file paths (LIKE fallback when
+   the SQLite build has no FTS5)
+2. Near-duplicate: MinHash signatures of the prompt's word shingles, with
+   LSH bands stored in a table so candidates are found by index lookup
+
+    library = get_library()
+    library.add(prompt, complexity, model, files)
+    library.search("fastapi auth postgres")      # ranked LibraryMatch list
+    library.find_similar(prompt, complexity)     # best near-duplicate or None
+"""
+import hashlib
+import json
+import os
+import random
+import re
+import sqlite3
+import struct
+import threading
+import time
+import zlib
+from collections import namedtuple
+
+from app.cache import DEFAULT_CACHE_DIR
+from app.shared import process_singleton
+
+MINHASH_PERMUTATIONS = 64
+LSH_BANDS = 16                      # 16 bands x 4 rows: pairs above ~0.5 similarity usually share a band
+LSH_ROWS = MINHASH_PERMUTATIONS // LSH_BANDS
+REUSE_SIMILARITY = 0.85             # Default threshold for "this is the same request"
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_rng = random.Random(20240601)      # Fixed seed: signatures must be stable across processes
+_PERMUTATIONS = [(_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(0, _MERSENNE_PRIME))
+                 for _ in range(MINHASH_PERMUTATIONS)]
+_SIGNATURE = struct.Struct(f"<{MINHASH_PERMUTATIONS}Q")
+_WORD = re.compile(r"[a-z0-9]+")
+_STOPWORDS = {
+    "a", "an", "the", "and", "or", "with", "for", "to", "of", "in", "on", "using", "use", "that",
+    "this", "is", "it", "my", "me", "i", "want", "build", "create", "make", "please", "app", "project",
+}
+
+LibraryMatch = namedtuple("LibraryMatch", "id prompt complexity model file_count created uses score")
+
+
+def prompt_words(text):
+    return [word for word in _WORD.findall(text.casefold()) if word not in _STOPWORDS]
+
+def shingles(text):
+    """
+    Word unigrams and bigrams of a prompt (stopwords dropped), the unit MinHash compares.
+    """
+    words = prompt_words(text)
+    return set(words) | {f"{a} {b}" for a, b in zip(words, words[1:])}
+
+def minhash(text):
+    """
+    MinHash signature (MINHASH_PERMUTATIONS ints) of the prompt's shingles, or None
+    when it has none (e.g. only stopwords): such prompts say nothing to compare.
+    """
+    hashes = [int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "little")
+              for s in shingles(text)]
+    if not hashes:
+        return None
+    return tuple(min((a * h + b) % _MERSENNE_PRIME for h in hashes) for a, b in _PERMUTATIONS)
+
+def similarity(signature_a, signature_b):
+    """
+    Estimated Jaccard similarity of two signatures (0 if either is missing).
+    """
+    if signature_a is None or signature_b is None:
+        return 0.0
+    return sum(1 for x, y in zip(signature_a, signature_b) if x == y) / MINHASH_PERMUTATIONS
+
+def _unpack(blob):
+    return _SIGNATURE.unpack(blob) if blob is not None else None
+
+def _bands(signature):
+    # One 56-bit key per band (fits SQLite's signed INTEGER); none for a missing signature
+    if signature is None:
+        return
+    for band in range(LSH_BANDS):
+        rows = signature[band * LSH_ROWS:(band + 1) * LSH_ROWS]
+        digest = hashlib.blake2b(struct.pack(f"<{LSH_ROWS}Q", *rows), digest_size=7).digest()
+        yield band, int.from_bytes(digest, "little")
+
+
+class BlueprintLibrary:
+    """
+    SQLite-backed library of parsed blueprints (the flattened dict from parse_ai_response).
+    """
+
+    def __init__(self, path=None):
+        if path is None:
+            os.makedirs(DEFAULT_CACHE_DIR, exist_ok=True)
+            path = os.path.join(DEFAULT_CACHE_DIR, "library.sqlite3")
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(
+            "CREATE TABLE IF NOT EXISTS library ("
+            " id INTEGER PRIMARY KEY, key TEXT UNIQUE, prompt TEXT, complexity TEXT, model TEXT,"
+            " payload BLOB, file_count INTEGER, signature BLOB, metadata TEXT,"
+            " created REAL, used REAL, uses INTEGER DEFAULT 0);"
+            "CREATE TABLE IF NOT EXISTS library_bands (band INTEGER, hash INTEGER, id INTEGER);"
+            "CREATE INDEX IF NOT EXISTS library_bands_lookup ON library_bands (band, hash);"
+            "CREATE INDEX IF NOT EXISTS library_bands_id ON library_bands (id);"
+        )
+        try:
+            self._db.execute("CREATE VIRTUAL TABLE IF NOT EXISTS library_fts USING fts5(prompt, paths)")
+            self.fts = True
+        except sqlite3.OperationalError:
+            self.fts = False  # SQLite built without FTS5: lexical search falls back to LIKE
+        self._db.commit()
+
+    # --- Writes ---
+    def add(self, user_prompt, complexity, model, files, metadata=None, key=None):
+        """
+        Stores a blueprint and returns its id. With a `key` (e.g. the cache key),
+        storing the same request again replaces the previous entry.
+        """
+        now = time.time()
+        signature = minhash(user_prompt)
+        payload = zlib.compress(json.dumps(files).encode("utf-8"))
+        paths = " ".join(re.sub(r"[/._-]+", " ", path) for path in files)
+        with self._lock:
+            if key is not None:
+                row = self._db.execute("SELECT id FROM library WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    self._delete(row[0])
+            cursor = self._db.execute(
+                "INSERT INTO library (key, prompt, complexity, model, payload, file_count, signature, metadata, created, used)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, user_prompt, complexity, model, payload, len(files),
+                 _SIGNATURE.pack(*signature) if signature is not None else None,
+                 json.dumps(metadata or {}), now, now)
+            )
+            blueprint_id = cursor.lastrowid
+            # Prompts without shingles are only findable lexically
+            self._db.executemany(
+                "INSERT INTO library_bands (band, hash, id) VALUES (?, ?, ?)",
+                [(band, value, blueprint_id) for band, value in _bands(signature)]
+            )
+            if self.fts:
+                self._db.execute("INSERT INTO library_fts (rowid, prompt, paths) VALUES (?, ?, ?)",
+                                 (blueprint_id, user_prompt, paths))
+            self._db.commit()
+            return blueprint_id
+
+    def delete(self, blueprint_id):
+        with self._lock:
+            self._delete(blueprint_id)
+            self._db.commit()
+
+    # --- Reads ---
+    def get(self, blueprint_id):
+        """
+        Returns the flattened file dict (and counts it as a reuse), or None.
+        """
+        with self._lock:
+            row = self._db.execute("SELECT payload FROM library WHERE id = ?", (blueprint_id,)).fetchone()
+            if row is None:
+                return None
+            self._db.execute("UPDATE library SET used = ?, uses = uses + 1 WHERE id = ?", (time.time(), blueprint_id))
+            self._db.commit()
+        return json.loads(zlib.decompress(row[0]).decode("utf-8"))
+
+    def search(self, query, complexity=None, limit=10):
+        """
+        Ranked matches for a free-text query: lexical hits and MinHash near-duplicates,
+        scored by estimated prompt similarity (plus a small bonus for lexical hits).
+        """
+        signature = minhash(query)
+        with self._lock:
+            lexical = self._lexical_ids(query, limit * 5)
+            candidates = set(lexical) | self._band_ids(signature)
+            rows = self._rows(candidates, complexity)
+
+        matches = []
+        for row in rows:
+            score = similarity(signature, _unpack(row[-1]))
+            if row[0] in lexical:
+                score += 0.25 * (1 - lexical[row[0]] / max(len(lexical), 1))
+            matches.append(LibraryMatch(*row[:-1], score=round(min(score, 1.0), 3)))
+        matches.sort(key=lambda match: (-match.score, -match.created))
+        return matches[:limit]
+
+    def find_similar(self, user_prompt, complexity, model=None, threshold=REUSE_SIMILARITY):
+        """
+        The closest stored blueprint for the same complexity (and model, if given)
+        whose prompt similarity reaches `threshold`, or None.
+        """
+        signature = minhash(user_prompt)
+        if signature is None:
+            return None
+        with self._lock:
+            rows = self._rows(self._band_ids(signature), complexity)
+        best = None
+        for row in rows:
+            if model is not None and row[3] != model:
+                continue
+            score = similarity(signature, _unpack(row[-1]))
+            if score >= threshold and (best is None or score > best.score):
+                best = LibraryMatch(*row[:-1], score=round(score, 3))
+        return best
+
+    def recent(self, limit=10):
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id, prompt, complexity, model, file_count, created, uses FROM library"
+                " ORDER BY used DESC LIMIT ?", (limit,)
+            ).fetchall()
+        return [LibraryMatch(*row, score=None) for row in rows]
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM library").fetchone()[0]
+
+    # --- Internals ---
+    def _delete(self, blueprint_id):
+        self._db.execute("DELETE FROM library WHERE id = ?", (blueprint_id,))
+        self._db.execute("DELETE FROM library_bands WHERE id = ?", (blueprint_id,))
+        if self.fts:
+            self._db.execute("DELETE FROM library_fts WHERE rowid = ?", (blueprint_id,))
+
+    def _lexical_ids(self, query, limit):
+        """
+        {id: rank} of lexical matches, best first.
+        """
+        words = prompt_words(query)
+        if not words:
+            return {}
+        if self.fts:
+            # Quoted terms OR-ed together: no FTS syntax errors from user input
+            match = " OR ".join(f'"{word}"' for word in words)
+            rows = self._db.execute(
+                "SELECT rowid FROM library_fts WHERE library_fts MATCH ? ORDER BY bm25(library_fts) LIMIT ?",
+                (match, limit)
+            ).fetchall()
+        else:
+            clause = " OR ".join("prompt LIKE ?" for _ in words)
+            rows = self._db.execute(
+                f"SELECT id FROM library WHERE {clause} ORDER BY used DESC LIMIT ?",
+                [f"%{word}%" for word in words] + [limit]
+            ).fetchall()
+        return {row[0]: rank for rank, row in enumerate(rows)}
+
+    def _band_ids(self, signature):
+        ids = set()
+        for band, value in _bands(signature):
+            ids.update(row[0] for row in self._db.execute(
+                "SELECT id FROM library_bands WHERE band = ? AND hash = ?", (band, value)
+            ))
+        return ids
+
+    def _rows(self, ids, complexity=None):
+        if not ids:
+            return []
+        ids = list(ids)
+        placeholders = ",".join("?" for _ in ids)
+        sql = ("SELECT id, prompt, complexity, model, file_count, created, uses, signature FROM library"
+               f" WHERE id IN ({placeholders})")
+        if complexity is not None:
+            sql += " AND complexity = ?"
+            ids.append(complexity)
+        return self._db.execute(sql, ids).fetchall()
+
+
+@process_singleton
+def get_library():
+    return BlueprintLibrary()
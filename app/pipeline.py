@@ -0,0 +1,333 @@
+import asyncio
+import json
+from concurrent.futures import as_completed
+
+from app.api_handler import (get_ai_response, aget_file_response, get_file_response, stream_ai_response, extract_error,
+                             is_credential_error, prompt_version, InferenceError, DEFAULT_MODEL, PROMPT_VERSION, PROTOCOL_JSON, PROTOCOL_RECORDS)
+from app.cache import make_cache_key
+from app.inference import get_backend
+from app import tracing
+from app.jobs import JobCancelled
+from app.singleflight import SingleFlightTimeout
+from app.tracing import span
+from app.utils import parse_ai_response, parse_records, strip_code_fences, StreamingTreeParser, RecordStreamParser
+
+# Cache-key version for blueprints built by the two-phase pipeline
+PIPELINE_VERSION = f"{PROMPT_VERSION}+parallel-1"
+
+STRATEGY_SINGLE = "Single Pass (Streaming)"
+STRATEGY_PARALLEL = "Parallel (Skeleton + Files)"
+STRATEGIES = [STRATEGY_SINGLE, STRATEGY_PARALLEL]
+
+def parse_output(raw_text, protocol=PROTOCOL_JSON, status=None):
+    """
+    {path: content} from a complete model response in either output protocol.
+    If a dict is passed as `status`, status["truncated"] tells whether the response was cut off.
+    """
+    if protocol == PROTOCOL_RECORDS:
+        return parse_records(raw_text, status)
+    return parse_ai_response(raw_text, status)
+
+# Seconds a request waits for an identical in-flight generation before running its own
+SINGLE_FLIGHT_TIMEOUT = 300
+
+
+class CredentialFailure(Exception):
+    """
+    A shared generation failed because of the leader's API key. Its followers bring
+    their own keys, so they retry instead of sharing the failure; `result` is the
+    leader's own result.
+    """
+
+    def __init__(self, result):
+        super().__init__(result[3])
+        self.result = result
+
+def generate_blueprint(user_prompt, api_key=None, complexity="Working Code", model=DEFAULT_MODEL,
+                       strategy=STRATEGY_SINGLE, cache=None, on_file=None, cancel_event=None,
+                       single_flight=None, on_wait=None, library=None, protocol=PROTOCOL_JSON, outcome=None):
+    """
+    Full generation flow shared by the Builder page and headless callers:
+    cache lookup -> inference (streaming or parallel) -> parse -> cache store.
+
+    Returns (flattened_files, raw). raw is None on a cache hit, and is the
+    model output otherwise (useful for debugging failures).
+    `on_file(path, content)` is called as each file becomes available.
+    With a singleflight.SingleFlight, identical requests in flight share one model
+    call; `on_wait()` is called if this one waits for another's.
+    With a library.BlueprintLibrary, every new blueprint is also added to it.
+    `protocol` is the model's output format (api_handler.PROTOCOLS).
+    If a dict is passed as `outcome`, it is filled with "complete" (False when the
+    output was cut off, the stream failed midway or a file failed) and "error".
+    Only complete, error-free blueprints are cached and added to the library.
+    Raises jobs.JobCancelled if `cancel_event` gets set.
+    """
+    if outcome is None:
+        outcome = {}
+    outcome.update(complete=True, error=None)
+
+    # 1. Cache
+    parallel = strategy == STRATEGY_PARALLEL
+    version = prompt_version(protocol)
+    cache_key = make_cache_key(user_prompt, complexity, model, version.replace(PROMPT_VERSION, PIPELINE_VERSION) if parallel else version)
+    if cache is not None:
+        with span("cache", cache="miss") as trace:
+            cached = cache.get(cache_key)
+            if cached:
+                trace.set(cache="hit", files=len(cached))
+                return cached, None
+
+    # 2. Inference
+    def run():
+        status = {}
+        error = None
+        if parallel:
+            parsed, raw = generate_project_parallel(
+                user_prompt, api_key=api_key, complexity=complexity, model=model,
+                on_file=(lambda path, content, error: on_file(path, content)) if on_file else None,
+                cancel_event=cancel_event, protocol=protocol, status=status
+            )
+            error = extract_error(raw) if parsed is None else status.get("error")
+            complete = parsed is not None and not status.get("truncated")
+        else:
+            records = protocol == PROTOCOL_RECORDS
+            parser = RecordStreamParser() if records else StreamingTreeParser()
+            raw_chunks = []
+            try:
+                for chunk in stream_ai_response(user_prompt, api_key=api_key, complexity=complexity, model=model, protocol=protocol):
+                    if cancel_event is not None and cancel_event.is_set():
+                        raise JobCancelled()
+                    raw_chunks.append(chunk)
+                    for path, content in parser.feed(chunk):
+                        if on_file:
+                            on_file(path, content)
+            except InferenceError as e:
+                # The stream failed midway: keep what arrived, but never as model text
+                error = str(e)
+            raw = "".join(raw_chunks) if raw_chunks or error is None else json.dumps({"error": error})
+
+            if not raw_chunks:
+                parsed, complete = None, False
+            elif records:
+                # Every record was already validated as it arrived; only the last line may be pending
+                parser.finish()
+                parsed, complete = parser.files, parser.done
+            else:
+                # Full parse is authoritative; fall back to whatever streamed in
+                parsed = parse_ai_response(raw, status)
+                complete = parsed is not None and not status.get("truncated")
+                parsed = parsed or parser.files
+            complete = complete and error is None
+
+        # 3. Store: a cut-off or failed blueprint is returned, but never reused
+        if parsed and complete:
+            if cache is not None:
+                cache.set(cache_key, parsed)
+            if library is not None:
+                library.add(user_prompt, complexity, model, parsed, metadata={"strategy": strategy}, key=cache_key)
+        return parsed, raw, complete, error
+
+    def run_shared():
+        result = run()
+        if result[0] is None and is_credential_error(result[3]):
+            raise CredentialFailure(result)
+        return result
+
+    if single_flight is None:
+        parsed, raw, complete, error = run()
+    else:
+        # Identical generations already in flight are joined instead of calling the model again.
+        # A leader that was cancelled or whose API key was rejected hands over to a waiting
+        # follower; a follower that waited too long (e.g. the shared call hangs) runs its own.
+        try:
+            (parsed, raw, complete, error), shared = single_flight.do(
+                cache_key, run_shared, timeout=SINGLE_FLIGHT_TIMEOUT, cancel_event=cancel_event,
+                retry_on=(JobCancelled, CredentialFailure), on_wait=on_wait
+            )
+            if shared and parsed:
+                parsed = dict(parsed)  # Each waiter gets its own dict
+        except CredentialFailure as e:
+            # The leader's own failure (a follower only gets here once it was cancelled)
+            if cancel_event is not None and cancel_event.is_set():
+                raise JobCancelled() from e
+            parsed, raw, complete, error = e.result
+        except SingleFlightTimeout:
+            parsed, raw, complete, error = run()
+    outcome.update(complete=complete, error=error)
+    return parsed, raw
+
+def generation_job(job, user_prompt, trace=False, **kwargs):
+    """
+    JobManager entry point: runs generate_blueprint and reports progress on the job.
+    Returns (flattened_files, outcome, raw), see generate_blueprint.
+    With trace=True the job's spans are collected even if tracing is off process-wide.
+    """
+    job.report(message="Connecting to AI Engine...")
+    outcome = {}
+    with tracing.collect(force=trace) as collected:
+        tracing.record_duration("queue", job.started - job.created)
+        try:
+            parsed, raw = generate_blueprint(
+                user_prompt,
+                on_file=lambda path, content: job.report(message=f"Received {path}", item=path, output=content),
+                on_wait=lambda: job.report(message="Joining an identical generation already in progress..."),
+                cancel_event=job.cancel_event,
+                outcome=outcome,
+                **kwargs
+            )
+            return parsed, outcome, raw
+        finally:
+            job.trace = collected.breakdown()
+            tracing.write_prometheus()
+
+def generate_project_parallel(user_prompt, api_key=None, complexity="Working Code", model=DEFAULT_MODEL,
+                              max_concurrency=4, on_file=None, cancel_event=None, protocol=PROTOCOL_JSON, status=None):
+    """
+    Two-phase generation:
+    1. One "Structure Only" call returns the project skeleton (paths only).
+    2. Every file body is requested separately, concurrently, with at most
+       `max_concurrency` requests in flight.
+
+    Wall-clock time follows the slowest file instead of the sum of all files,
+    and project size is no longer capped by a single response's max_tokens.
+
+    Returns (flattened_files, skeleton_raw). flattened_files is None when the
+    skeleton could not be generated; skeleton_raw is kept for debugging.
+    `on_file(path, content, error)` is called as each file finishes.
+    If a dict is passed as `status`, it gets "truncated" (the skeleton was cut off or
+    a file fell back to its skeleton content) and "error" (the first file error).
+    Raises jobs.JobCancelled if `cancel_event` gets set.
+    """
+    if status is None:
+        status = {}
+
+    # 1. Skeleton
+    skeleton_raw = get_ai_response(user_prompt, api_key=api_key, complexity="Structure Only", model=model, protocol=protocol)
+    if extract_error(skeleton_raw):
+        return None, skeleton_raw
+    skeleton = parse_output(skeleton_raw, protocol, status)
+    if not skeleton:
+        return None, skeleton_raw
+    if complexity == "Structure Only":
+        return skeleton, skeleton_raw
+
+    # 2. File bodies (fan out on the pooled inference loop)
+    files, errors = _fill_files(user_prompt, skeleton, api_key, complexity, model, max_concurrency, on_file, cancel_event)
+    if errors:
+        status["truncated"] = True
+        status["error"] = f"{len(errors)} file(s) failed, e.g. {errors[0]}"
+    return files, skeleton_raw
+
+async def _new_semaphore(limit):
+    # Created on the backend loop so it binds to the right event loop
+    return asyncio.Semaphore(limit)
+
+async def _one_file(semaphore, user_prompt, path, paths, api_key, complexity, model):
+    async with semaphore:
+        raw = await aget_file_response(
+            user_prompt, path, paths, api_key=api_key, complexity=complexity, model=model
+        )
+    return path, raw
+
+def _fill_files(user_prompt, skeleton, api_key, complexity, model, max_concurrency, on_file, cancel_event):
+    backend = get_backend()
+    paths = list(skeleton.keys())
+    semaphore = backend.run(_new_semaphore(max_concurrency))
+    futures = [
+        backend.submit(_one_file(semaphore, user_prompt, path, paths, api_key, complexity, model))
+        for path in paths
+    ]
+
+    # 3. Merge in the caller's thread: keep skeleton order, fall back to the skeleton content on errors
+    files = dict(skeleton)
+    errors = []
+    for finished in as_completed(futures):
+        if cancel_event is not None and cancel_event.is_set():
+            for future in futures:
+                future.cancel()
+            raise JobCancelled()
+        path, raw = finished.result()
+        error = extract_error(raw)
+        if error:
+            errors.append(f"{path}: {error}")
+        else:
+            files[path] = strip_code_fences(raw)
+        if on_file:
+            on_file(path, files[path], error)
+    return files, errors
+
+def regenerate_paths(user_prompt, target, files, api_key=None, complexity="Working Code", model=DEFAULT_MODEL,
+                     instructions=None, outcome=None):
+    """
+    Regenerates one file or one folder of an existing project, sending the
+    current tree as context, instead of regenerating the whole project.
+
+    Returns (new_files, removed_paths, raw):
+    - new_files: {path: content} to merge into the project
+    - removed_paths: files that were under the folder but are not anymore
+    - raw: the model output (for debugging); new_files is None on failure
+    If a dict is passed as `outcome`, "complete" is set to False when the folder
+    output was cut off; nothing is reported as removed then, since the missing
+    files may just be the ones after the cut.
+    """
+    if outcome is None:
+        outcome = {}
+    outcome["complete"] = True
+    project_paths = list(files)
+    target = target.strip("/")
+
+    # 1. Single file: same call as the parallel pipeline, plus the change request
+    if target in files:
+        raw = get_file_response(
+            user_prompt, target, project_paths, api_key=api_key, complexity=complexity, model=model,
+            instructions=instructions
+        )
+        if extract_error(raw):
+            return None, [], raw
+        return {target: strip_code_fences(raw)}, [], raw
+
+    # 2. Folder: ask for that folder only, as a JSON object relative to it
+    prefix = f"{target}/"
+    old_paths = [path for path in project_paths if path.startswith(prefix)]
+    context = (
+        f"Regenerate ONLY the folder '{target}' of an existing project. "
+        f"Output a JSON object describing the contents of that folder, with keys relative to it.\n\n"
+        "EXISTING PROJECT TREE:\n" + "\n".join(project_paths)
+    )
+    if instructions:
+        context += f"\n\nChange request: {instructions}"
+
+    raw = get_ai_response(user_prompt, api_key=api_key, complexity=complexity, model=model, context=context)
+    if extract_error(raw):
+        return None, [], raw
+    status = {}
+    parsed = parse_ai_response(raw, status)
+    if not parsed:
+        return None, [], raw
+
+    # The model sometimes repeats the folder (full path or just its name) as the root key
+    folder_name = target.rsplit("/", 1)[-1] + "/"
+    for root in (prefix, folder_name):
+        if all(path.startswith(root) for path in parsed):
+            parsed = {path[len(root):]: content for path, content in parsed.items()}
+            break
+    new_files = {prefix + path: content for path, content in parsed.items()}
+    if status.get("truncated"):
+        outcome["complete"] = False
+        return new_files, [], raw
+    removed = [path for path in old_paths if path not in new_files]
+    return new_files, removed, raw
+
+def regeneration_job(job, user_prompt, target, files, trace=False, **kwargs):
+    """
+    JobManager entry point for regenerate_paths (`trace` as in generation_job).
+    Returns (new_files, removed_paths, outcome, raw).
+    """
+    job.report(message=f"Regenerating {target}...")
+    outcome = {}
+    with tracing.collect(force=trace) as collected:
+        try:
+            new_files, removed, raw = regenerate_paths(user_prompt, target, files, outcome=outcome, **kwargs)
+            return new_files, removed, outcome, raw
+        finally:
+            job.trace = collected.breakdown()
@@ -0,0 +1,120 @@
+"""
+Token-budget planner.
+
+Estimates how large a blueprint will be from the prompt and complexity, then
+picks max_tokens (instead of a fixed 3000 for every job) and, for the
+"auto" model preset, which model should run it:
+
+    plan = plan_generation("A Flask API with auth and tests", "Working Code", AUTO_MODEL)
+    plan.model, plan.max_tokens, plan.max_continuations
+
+When the estimate does not fit in one response, the plan allows continuation
+requests: the caller sends the partial output back and asks the model to
+carry on (see api_handler.get_ai_response).
+"""
+import math
+import re
+from collections import namedtuple
+
+AUTO_MODEL = "auto"
+FAST_MODEL = "google/gemma-2-9b-it"
+HEAVY_MODEL = "Qwen/Qwen2.5-Coder-32B-Instruct"
+
+# Largest completion we ask for in one request
+MAX_OUTPUT_TOKENS = 4096
+MIN_OUTPUT_TOKENS = 512
+# Jobs estimated below this go to the fast model when routing is on
+SMALL_JOB_TOKENS = 1500
+# Safety margin on top of the estimate (the heuristic is rough)
+HEADROOM = 1.3
+
+BASE_FILES = 6
+TOKENS_PER_FILE = {"Structure Only": 12, "Simple Code": 70, "Working Code": 320}
+FILE_TOKENS = {"Simple Code": 600, "Working Code": 2000}
+
+# Prompt words that usually mean extra files in the blueprint
+_COMPONENT_WORDS = {
+    "api", "rest", "graphql", "auth", "authentication", "login", "database", "db", "sql", "orm",
+    "models", "migrations", "frontend", "backend", "ui", "react", "vue", "angular", "dashboard",
+    "admin", "tests", "testing", "docker", "kubernetes", "ci", "cli", "worker", "queue", "celery",
+    "cache", "redis", "websocket", "payments", "email", "notifications", "upload", "search",
+    "microservice", "microservices", "pipeline", "scheduler", "logging", "config", "docs",
+}
+_WORD = re.compile(r"[a-z0-9]+")
+
+GenerationPlan = namedtuple("GenerationPlan", "model max_tokens estimated_tokens estimated_files max_continuations")
+
+
+def estimate_files(user_prompt):
+    """
+    Rough number of files the prompt asks for: a base project plus a few files
+    per component mentioned, plus a little for long, detailed prompts.
+    """
+    words = _WORD.findall(user_prompt.lower())
+    components = len(_COMPONENT_WORDS.intersection(words))
+    return BASE_FILES + 3 * components + len(words) // 15
+
+def estimate_tokens(user_prompt, complexity):
+    """
+    Expected completion size in tokens (JSON overhead included).
+    """
+    files = estimate_files(user_prompt)
+    per_file = TOKENS_PER_FILE.get(complexity, TOKENS_PER_FILE["Working Code"])
+    return 40 + files * (per_file + 10)
+
+def route_model(complexity, estimated_tokens):
+    """
+    Structure-only and small jobs go to the fast model, the rest to the coder model.
+    """
+    if complexity == "Structure Only" or estimated_tokens <= SMALL_JOB_TOKENS:
+        return FAST_MODEL
+    return HEAVY_MODEL
+
+def plan_generation(user_prompt, complexity, model=AUTO_MODEL):
+    """
+    Returns the GenerationPlan for one whole-project request.
+    `model` is only changed when it is AUTO_MODEL.
+    """
+    estimated = estimate_tokens(user_prompt, complexity)
+    budget = math.ceil(estimated * HEADROOM)
+    if model == AUTO_MODEL:
+        model = route_model(complexity, estimated)
+
+    max_tokens = max(MIN_OUTPUT_TOKENS, min(MAX_OUTPUT_TOKENS, budget))
+    # The continuations the overflow needs (ceil - 1), plus one spare since the estimate can be low
+    continuations = math.ceil(budget / max_tokens)
+    return GenerationPlan(model, max_tokens, estimated, estimate_files(user_prompt), continuations)
+
+def plan_file(complexity, model=AUTO_MODEL):
+    """
+    (model, max_tokens) for one file of the parallel pipeline.
+    """
+    if model == AUTO_MODEL:
+        model = FAST_MODEL if complexity == "Simple Code" else HEAVY_MODEL
+    return model, FILE_TOKENS.get(complexity, FILE_TOKENS["Working Code"])
+
+def resolve_models(model):
+    """
+    Concrete model IDs a setting can use (both for AUTO_MODEL), e.g. for warm-up.
+    """
+    return [FAST_MODEL, HEAVY_MODEL] if model == AUTO_MODEL else [model]
+
+def continuation_messages(messages, partial):
+    """
+    Messages asking the model to carry on from a response cut off by max_tokens.
+    """
+    return messages + [
+        {"role": "assistant", "content": partial},
+        {"role": "user", "content": "Your output was cut off. Continue EXACTLY where it stopped, "
+                                    "without repeating anything and without markdown. Output only what is missing, in the same format."},
+    ]
+
+def join_continuation(partial, more):
+    """
+    Appends a continuation, dropping a code fence the model may have opened again.
+    """
+    more = more or ""
+    if more.lstrip().startswith("```"):
+        more = more.lstrip()
+        more = more.split("\n", 1)[1] if "\n" in more else ""
+    return partial + more
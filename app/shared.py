@@ -0,0 +1,28 @@
+import functools
+import threading
+
+
+def process_singleton(factory):
+    """
+    Turns a zero-argument factory into a getter for one process-wide instance,
+    shared by every Streamlit session (and CLI worker):
+
+        @process_singleton
+        def get_job_manager():
+            return JobManager()
+
+    The instance is created on the first call, exactly once even when several
+    threads ask for it at the same time.
+    """
+    lock = threading.Lock()
+    instance = []
+
+    @functools.wraps(factory)
+    def get():
+        if not instance:
+            with lock:
+                if not instance:
+                    instance.append(factory())
+        return instance[0]
+
+    return get
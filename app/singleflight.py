@@ -0,0 +1,106 @@
+import threading
+import time
+from concurrent.futures import Future, wait
+
+from app.jobs import JobCancelled
+from app.shared import process_singleton
+
+
+class SingleFlightTimeout(TimeoutError):
+    """Raised to a follower that waited longer than its timeout for the shared call."""
+
+
+class SingleFlight:
+    """
+    Coalesces identical in-flight calls: the first caller for a key (the leader)
+    runs fn, every caller that arrives while it runs (a follower) waits for the
+    same result instead of starting its own upstream request.
+
+    1. If the shared call raises, the exception is fanned out to every waiter and
+       the key is released, so the next request starts a fresh call.
+    2. Exceptions listed in `retry_on` (e.g. the leader's job was cancelled) are
+       not the followers' failure: one of them takes over as the new leader.
+    3. Followers give up after `timeout` seconds (SingleFlightTimeout) or when their own
+       `cancel_event` is set; the leader keeps running for the others.
+    4. A call older than `stale_after` seconds is no longer joined.
+    """
+
+    def __init__(self, stale_after=600.0):
+        self.stale_after = stale_after
+        self._lock = threading.Lock()
+        self._calls = {}      # key -> (Future, started)
+
+    def do(self, key, fn, timeout=None, cancel_event=None, retry_on=(), on_wait=None):
+        """
+        Returns (result, shared): shared is True when the result came from another caller's call.
+        `on_wait()` is called once if this caller has to wait for a leader.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            # 1. Join an in-flight call, or become its leader
+            with self._lock:
+                call = self._calls.get(key)
+                if call is not None and time.monotonic() - call[1] > self.stale_after:
+                    call = None
+                if call is None:
+                    future = Future()
+                    self._calls[key] = (future, time.monotonic())
+                    leader = True
+                else:
+                    future = call[0]
+                    leader = False
+
+            if leader:
+                return self._lead(key, future, fn), False
+
+            # 2. Follower: wait for the leader's result
+            if on_wait is not None:
+                on_wait()
+                on_wait = None
+            try:
+                return self._wait(future, deadline, cancel_event), True
+            except retry_on:
+                if cancel_event is not None and cancel_event.is_set():
+                    raise  # This caller was cancelled itself: never take over as leader
+                continue
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._calls)
+
+    def _lead(self, key, future, fn):
+        try:
+            result = fn()
+        except BaseException as e:
+            self._release(key, future)
+            future.set_exception(e)
+            raise
+        self._release(key, future)
+        future.set_result(result)
+        return result
+
+    def _release(self, key, future):
+        # Before the result is published, so retrying followers never rejoin a finished call
+        with self._lock:
+            if self._calls.get(key, (None,))[0] is future:
+                del self._calls[key]
+
+    def _wait(self, future, deadline, cancel_event):
+        # Short waits so a follower notices its own cancellation
+        while True:
+            interval = 0.25
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise SingleFlightTimeout("Timed out waiting for an identical in-flight generation")
+                interval = min(interval, remaining)
+            if cancel_event is not None and cancel_event.is_set():
+                raise JobCancelled()
+            done, _ = wait([future], timeout=interval)
+            if done:
+                return future.result()
+
+
+@process_singleton
+def get_single_flight():
+    return SingleFlight()
@@ -0,0 +1,183 @@
+import hashlib
+import sys
+import zlib
+from collections import OrderedDict
+from collections.abc import Mapping
+
+
+class ProjectStore(Mapping):
+    """
+    Compact, read-mostly replacement for the {path: content} dict kept in
+    st.session_state for every session.
+
+    1. Whole paths are interned, so sessions holding the same blueprint share them
+       (components are not: a str cannot share its prefix with another one).
+    2. File contents are stored once per distinct value (repeated __init__.py,
+       empty files, identical configs all point to one blob).
+    3. With compress=True, large blobs stay zlib-compressed until viewed; the
+       few most recently read ones are kept decompressed.
+    4. The selection is a set of integer file IDs instead of a list of paths.
+
+    It behaves like a read-only dict of path -> content (iteration keeps the
+    original order), so parsing, tree and ZIP code can use it unchanged.
+    """
+
+    def __init__(self, files=None, compress=False, compress_min_bytes=512, hot_items=8):
+        self.compress = compress
+        self.compress_min_bytes = compress_min_bytes
+        self.hot_items = hot_items
+        self.selected = set()            # Selected file IDs
+        self._paths = []                 # File ID -> interned path (None once removed)
+        self._ids = {}                   # Path -> file ID
+        self._blob_of = []               # File ID -> blob ID
+        self._blobs = []                 # Blob ID -> str, or zlib bytes when compressed
+        self._blob_refs = []             # Blob ID -> number of files using it
+        self._blob_digests = []          # Blob ID -> content digest
+        self._blob_by_digest = {}        # Content digest -> blob ID
+        self._hot = OrderedDict()        # Blob ID -> decompressed str (small LRU)
+        if files:
+            self.update(files)
+
+    # --- Mapping interface ---
+    def __getitem__(self, path):
+        file_id = self._ids[path]
+        return self._content(self._blob_of[file_id])
+
+    def __iter__(self):
+        return (path for path in self._paths if path is not None)
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __contains__(self, path):
+        return path in self._ids
+
+    # --- Writes ---
+    def update(self, files):
+        """
+        Adds or replaces files. Returns the list of paths whose content changed.
+        """
+        changed = []
+        for path, content in files.items():
+            if not isinstance(content, str):
+                content = str(content)
+            blob_id = self._intern_blob(content)
+            file_id = self._ids.get(path)
+            if file_id is None:
+                path = sys.intern(path)
+                file_id = len(self._paths)
+                self._paths.append(path)
+                self._blob_of.append(blob_id)
+                self._ids[path] = file_id
+                changed.append(path)
+            else:
+                old_blob = self._blob_of[file_id]
+                self._blob_of[file_id] = blob_id
+                self._release_blob(old_blob)
+                if old_blob != blob_id:
+                    changed.append(path)
+        return changed
+
+    def remove(self, paths):
+        """
+        Drops files (e.g. a regenerated folder that no longer has them).
+        """
+        for path in paths:
+            file_id = self._ids.pop(path, None)
+            if file_id is None:
+                continue
+            self._paths[file_id] = None
+            self.selected.discard(file_id)
+            self._release_blob(self._blob_of[file_id])
+            self._blob_of[file_id] = -1
+
+    # --- Selection ---
+    def file_id(self, path):
+        return self._ids.get(path)
+
+    def digest(self, path):
+        """
+        Content hash of a file (already computed for dedup), e.g. as a cache key.
+        """
+        return self._blob_digests[self._blob_of[self._ids[path]]]
+
+    def select_all(self):
+        self.selected = set(self._ids.values())
+
+    def clear_selection(self):
+        self.selected = set()
+
+    def select_paths(self, paths):
+        """
+        Replaces the selection with the files among `paths` (folder values are ignored).
+        Returns True if the selection changed.
+        """
+        ids = self._ids
+        new_selection = {ids[path] for path in paths if path in ids}
+        if new_selection == self.selected:
+            return False
+        self.selected = new_selection
+        return True
+
+    def selected_paths(self):
+        """
+        Selected paths in project order (the format streamlit-tree-select expects).
+        """
+        return [path for file_id, path in enumerate(self._paths) if file_id in self.selected]
+
+    def selected_files(self):
+        """
+        {path: content} for the selection, e.g. for the ZIP export.
+        """
+        return {path: self[path] for path in self.selected_paths()}
+
+    # --- Stats ---
+    def stats(self):
+        live_blobs = [blob for blob in self._blobs if blob is not None]
+        return {
+            "files": len(self),
+            "unique_contents": len(live_blobs),
+            "stored_bytes": sum(len(blob) for blob in live_blobs),
+        }
+
+    # --- Internals ---
+    def _intern_blob(self, content):
+        digest = hashlib.blake2b(content.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+        blob_id = self._blob_by_digest.get(digest)
+        if blob_id is not None:
+            self._blob_refs[blob_id] += 1
+            return blob_id
+
+        stored = content
+        if self.compress and len(content) >= self.compress_min_bytes:
+            stored = zlib.compress(content.encode("utf-8", "surrogatepass"), 6)
+        elif len(content) < 64:
+            stored = sys.intern(content)  # Tiny files ("", "# TODO") are shared across sessions too
+
+        blob_id = len(self._blobs)
+        self._blobs.append(stored)
+        self._blob_refs.append(1)
+        self._blob_digests.append(digest)
+        self._blob_by_digest[digest] = blob_id
+        return blob_id
+
+    def _release_blob(self, blob_id):
+        self._blob_refs[blob_id] -= 1
+        if self._blob_refs[blob_id] == 0:
+            self._blobs[blob_id] = None
+            self._hot.pop(blob_id, None)
+            self._blob_by_digest.pop(self._blob_digests[blob_id], None)
+
+    def _content(self, blob_id):
+        blob = self._blobs[blob_id]
+        if isinstance(blob, str):
+            return blob
+        text = self._hot.get(blob_id)
+        if text is None:
+            text = zlib.decompress(blob).decode("utf-8", "surrogatepass")
+            self._hot[blob_id] = text
+            while len(self._hot) > self.hot_items:
+                self._hot.popitem(last=False)
+        else:
+            self._hot.move_to_end(blob_id)
+        return text
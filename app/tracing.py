@@ -0,0 +1,214 @@
+"""
+Lightweight tracing for the generation hot path.
+
+    with span("parse", bytes_in=len(raw)) as s:
+        ...
+        s.set(files=len(files))
+
+When tracing is off (the default) span() returns a shared no-op object, so
+instrumented code pays two lookups per call. Turn it on for the process with
+the AI_ARCHITECT_TRACE=1 environment variable or enable(), or for one request
+with collect(force=True) (e.g. a session that opened the Builder debug panel).
+
+Finished spans go to three places:
+1. The active collect() block, if any (per-request breakdown, e.g. the Builder debug panel)
+2. Structured JSON log lines on the "ai_architect.trace" logger
+3. Aggregated counters, rendered by render_prometheus() / write_prometheus()
+Spans traced only because of collect(force=True) go to the collect() block alone.
+"""
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+
+logger = logging.getLogger("ai_architect.trace")
+
+_enabled = os.environ.get("AI_ARCHITECT_TRACE", "") not in ("", "0")
+_current = contextvars.ContextVar("ai_architect_trace", default=None)
+_forced = contextvars.ContextVar("ai_architect_trace_forced", default=False)
+_totals = {}            # span name -> [count, seconds, max_seconds]
+_counters = {}          # (metric, span name) -> value
+_lock = threading.Lock()
+
+# Numeric span attributes that are summed into Prometheus counters
+_COUNTED_ATTRS = ("bytes_in", "bytes_out", "prompt_tokens", "completion_tokens", "files")
+
+def enable(on=True):
+    global _enabled
+    _enabled = on
+
+def is_enabled():
+    return _enabled
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+_NOOP = _NoopSpan()
+
+
+class Span:
+    __slots__ = ("name", "attrs", "start", "duration", "error")
+
+    def __init__(self, name, attrs):
+        self.name = name
+        self.attrs = attrs
+        self.start = 0.0
+        self.duration = 0.0
+        self.error = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration = time.perf_counter() - self.start
+        if exc_type is not None:
+            self.error = exc_type.__name__
+        record(self)
+        return False
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def as_dict(self):
+        return {"span": self.name, "ms": round(self.duration * 1000, 3), "error": self.error, **self.attrs}
+
+
+def span(name, **attrs):
+    """
+    Times a block of code. Returns a no-op when tracing is disabled.
+    """
+    if not _enabled and not _forced.get():
+        return _NOOP
+    return Span(name, attrs)
+
+def record(finished):
+    """
+    Publishes a finished span (also used for spans timed elsewhere, e.g. job queueing).
+    """
+    collected = _current.get()
+    if collected is not None:
+        collected.append(finished)
+    if not _enabled:
+        return  # Traced for one request only: no process-wide log or metrics
+
+    with _lock:
+        totals = _totals.setdefault(finished.name, [0, 0.0, 0.0])
+        totals[0] += 1
+        totals[1] += finished.duration
+        totals[2] = max(totals[2], finished.duration)
+        for attr in _COUNTED_ATTRS:
+            value = finished.attrs.get(attr)
+            if isinstance(value, (int, float)):
+                key = (attr, finished.name)
+                _counters[key] = _counters.get(key, 0) + value
+        cache = finished.attrs.get("cache")
+        if cache in ("hit", "miss"):
+            key = (f"cache_{cache}", finished.name)
+            _counters[key] = _counters.get(key, 0) + 1
+
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(json.dumps(finished.as_dict(), default=str))
+
+def record_duration(name, seconds, **attrs):
+    """
+    Records a span whose duration was measured elsewhere.
+    """
+    if not _enabled and not _forced.get():
+        return
+    finished = Span(name, attrs)
+    finished.duration = seconds
+    record(finished)
+
+
+class collect:
+    """
+    Collects every span finished in this thread/context into `spans`:
+
+        with collect() as trace:
+            generate_blueprint(...)
+        trace.spans  # per-request breakdown
+
+    With force=True, spans are traced inside the block even when tracing is off.
+    """
+
+    def __init__(self, force=False):
+        self.spans = []
+        self.force = force
+        self._token = None
+        self._forced_token = None
+
+    def __enter__(self):
+        self._token = _current.set(self.spans)
+        if self.force:
+            self._forced_token = _forced.set(True)
+        return self
+
+    def __exit__(self, *exc):
+        if self._forced_token is not None:
+            _forced.reset(self._forced_token)
+        _current.reset(self._token)
+        return False
+
+    def breakdown(self):
+        return [finished.as_dict() for finished in self.spans]
+
+
+def render_prometheus():
+    """
+    Prometheus text exposition of every span seen since start-up.
+    """
+    lines = [
+        "# HELP ai_architect_span_seconds Time spent per instrumented stage.",
+        "# TYPE ai_architect_span_seconds summary",
+    ]
+    with _lock:
+        totals = dict(_totals)
+        counters = dict(_counters)
+    for name, (count, seconds, _max) in sorted(totals.items()):
+        lines.append(f'ai_architect_span_seconds_count{{span="{name}"}} {count}')
+        lines.append(f'ai_architect_span_seconds_sum{{span="{name}"}} {seconds:.6f}')
+    lines.append("# TYPE ai_architect_span_max_seconds gauge")
+    for name, (_count, _seconds, slowest) in sorted(totals.items()):
+        lines.append(f'ai_architect_span_max_seconds{{span="{name}"}} {slowest:.6f}')
+    for metric in sorted({metric for metric, _ in counters}):
+        lines.append(f"# TYPE ai_architect_{metric}_total counter")
+        for (name_metric, name), value in sorted(counters.items()):
+            if name_metric == metric:
+                lines.append(f'ai_architect_{metric}_total{{span="{name}"}} {value}')
+    return "\n".join(lines) + "\n"
+
+def write_prometheus(path=None):
+    """
+    Writes render_prometheus() atomically, for a node_exporter textfile collector.
+    Defaults to the AI_ARCHITECT_METRICS_FILE environment variable; no-op if unset.
+    Called from jobs, so failures are logged, never raised.
+    """
+    path = path or os.environ.get("AI_ARCHITECT_METRICS_FILE")
+    if not path or not _enabled:
+        return
+    # One temp file per write: concurrent jobs must not replace each other's
+    temp = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+    try:
+        with open(temp, "w", encoding="utf-8") as handle:
+            handle.write(render_prometheus())
+        os.replace(temp, path)
+    except OSError as e:
+        logger.warning("Could not write Prometheus metrics to %s: %s", path, e)
+        try:
+            os.remove(temp)
+        except OSError:
+            pass
@@ -1,112 +1,515 @@
 import json
 import re
+from functools import lru_cache
 
-def parse_ai_response(raw_text):
+from app.tracing import span
+
+# --- PATH FLATTENING ---
+def _split_key(key):
+    """
+    Splits one dict key into clean path segments ("src//app/./x" -> ["src", "app", "x"]).
+    """
+    return [part for part in key.replace("\\", "/").split("/") if part and part != "."]
+
+def _join_parts(parts):
+    """
+    Joins path segments once, resolving ".." without ever escaping the project root.
+    """
+    if ".." not in parts:
+        return "/".join(parts)
+    resolved = []
+    for part in parts:
+        if part == "..":
+            if resolved:
+                resolved.pop()
+        else:
+            resolved.append(part)
+    return "/".join(resolved)
+
+def normalize_path(keys):
+    """
+    Builds a clean relative path from a list of raw (possibly slash-containing) keys.
+    """
+    return _join_parts([segment for key in keys for segment in _split_key(key)])
+
+def iter_flattened_files(structure):
+    """
+    Walks the nested folder dict with an explicit stack and yields (path, content) pairs.
+    - If it finds a Dictionary, it's a Folder -> Push its segments and dive deeper.
+    - If it finds a String, it's a File -> Join the path once and yield it.
+    - Anything else (list, number) is an AI error and is skipped.
+    """
+    if not isinstance(structure, dict):
+        return
+
+    parts = []                                   # Shared path segments from the root
+    stack = [(iter(structure.items()), 0)]       # (children iterator, segments pushed by this folder)
+    while stack:
+        children, pushed = stack[-1]
+        for key, value in children:
+            if isinstance(value, dict):
+                segments = _split_key(key)
+                parts.extend(segments)
+                stack.append((iter(value.items()), len(segments)))
+                break
+            elif isinstance(value, str):
+                segments = _split_key(key)
+                if not segments:
+                    continue
+                parts.extend(segments)
+                path = _join_parts(parts)
+                del parts[-len(segments):]
+                if path:
+                    yield path, value
+        else:
+            # Folder exhausted -> Step back out
+            stack.pop()
+            if pushed:
+                del parts[-pushed:]
+
+def flatten_structure(structure):
+    """
+    Flattens the nested folder dict into {path: content}.
+    """
+    return dict(iter_flattened_files(structure))
+
+# --- JSON EXTRACTION ---
+_STRUCTURAL = re.compile(r'[{}\[\]":,]')
+_STRING_TAIL = re.compile(r'[^"\\]*(?:\\.[^"\\]*)*"', re.DOTALL)
+
+def extract_json_object(raw_text, start=0):
+    """
+    Single-pass, string-aware brace scanner (O(n), no backtracking).
+    Returns (json_str, truncated) for the first balanced top-level object
+    at or after `start`, or (None, False) if there is none.
+
+    If the text ends before the object closes (max_tokens hit), it is
+    repaired: cut back to the last completed value and close every open
+    bracket, so the files that did finish are kept.
+    """
+    begin = raw_text.find("{", start)
+    if begin == -1:
+        return None, False
+
+    stack = []          # Open brackets: "{" or "["
+    after_colon = False # True while the next string is an object value
+    cut = None          # (end_index, depth) of the last completed value
+    pos = begin
+
+    while True:
+        match = _STRUCTURAL.search(raw_text, pos)
+        if not match:
+            break
+        i = match.start()
+        ch = raw_text[i]
+
+        if ch == '"':
+            tail = _STRING_TAIL.match(raw_text, i + 1)
+            if not tail:
+                break  # Unterminated string (truncated output)
+            pos = tail.end()
+            if after_colon or stack[-1] == "[":
+                cut = (pos, len(stack))
+            after_colon = False
+            continue
+
+        if ch == ":":
+            after_colon = True
+        elif ch == ",":
+            after_colon = False  # A literal value (1, null, true) ended: the next string is a key
+        elif ch in "{[":
+            stack.append(ch)
+            after_colon = False
+        else:
+            stack.pop()
+            if not stack:
+                return raw_text[begin:i + 1], False
+            cut = (i + 1, len(stack))
+        pos = i + 1
+
+    # Truncated: close whatever was still open at the last completed value
+    if cut is None:
+        return None, True
+    end, depth = cut
+    closers = "".join("}" if bracket == "{" else "]" for bracket in reversed(stack[:depth]))
+    return raw_text[begin:end] + closers, True
+
+def parse_ai_response(raw_text, status=None):
     """
     Parses the AI's output to extract a valid file structure.
     Now supports:
     1. Nested Folders (Recursive Dicts)
     2. Slash-paths (e.g., "src/components/header.py")
-    3. Robust JSON extraction
+    3. Robust JSON extraction (single-pass scanner, repairs truncated output)
+    If a dict is passed as `status`, status["truncated"] tells whether the files
+    come from a repaired, cut-off object (i.e. the blueprint is incomplete).
     """
-    
+    if status is None:
+        status = {}
+    with span("parse", bytes_in=len(raw_text) if isinstance(raw_text, str) else 0) as trace:
+        files = _parse_files(raw_text, status)
+        trace.set(files=len(files) if files else 0, parsed=files is not None, truncated=status.get("truncated", False))
+        return files
+
+def _parse_files(raw_text, status):
     # 1. Clean and Find JSON
-    # We look for content between ```json and ``` or just the first/last brace
+    # Start after a ```json fence if there is one, else at the first brace
     try:
-        # Attempt 1: Strict Markdown code block
-        match = re.search(r"```json\s*(\{.*?\})\s*```", raw_text, re.DOTALL)
-        if match:
-            json_str = match.group(1)
-        else:
-            # Attempt 2: Loose brace finding (Fallback)
-            # Find the first '{' and the last '}'
-            start = raw_text.find('{')
-            end = raw_text.rfind('}') + 1
-            if start != -1 and end != 0:
-                json_str = raw_text[start:end]
-            else:
+        fence = raw_text.find("```json")
+        start = fence + 7 if fence != -1 else 0
+
+        # 2. Parse JSON String (retry from the next brace if prose contained a stray '{')
+        structure = None
+        for _ in range(3):
+            json_str, truncated = extract_json_object(raw_text, start)
+            if json_str is None:
                 return None
-                
-        # 2. Parse JSON String
-        structure = json.loads(json_str)
+            try:
+                structure = json.loads(json_str)
+                status["truncated"] = truncated
+                break
+            except json.JSONDecodeError:
+                start = raw_text.find("{", raw_text.find("{", start) + 1)
+                if start == -1:
+                    return None
+        if structure is None:
+            return None
         
-        # 3. Flatten the Structure (The Recursive Magic)
-        flattened_files = {}
-        
-        def _recurse_structure(current_node, current_path=""):
-            """
-            Walks through the dictionary. 
-            - If it finds a Dictionary, it's a Folder -> Dive deeper.
-            - If it finds a String, it's a File -> Save it.
-            """
-            if isinstance(current_node, dict):
-                for key, value in current_node.items():
-                    # Handle paths that might already have slashes (e.g. "app/utils")
-                    # We combine the current_path with the new key
-                    new_path = f"{current_path}/{key}" if current_path else key
-                    
-                    # Clean up double slashes just in case
-                    new_path = new_path.replace("//", "/")
-                    
-                    _recurse_structure(value, new_path)
-                    
-            elif isinstance(current_node, str):
-                # It is a file! Save the content.
-                # Remove any leading slash from the path
-                final_path = current_path.lstrip("/")
-                flattened_files[final_path] = current_node
-            
-            else:
-                # If it's a list or number, ignore it (AI error)
-                pass
-
-        # Start the recursion
-        _recurse_structure(structure)
-        
-        return flattened_files
+        # 3. Flatten the Structure (iterative, no recursion limit)
+        return flatten_structure(structure)
 
-    except (json.JSONDecodeError, AttributeError):
+    except (json.JSONDecodeError, AttributeError, RecursionError):
         # JSON was broken or not found
         return None
-def format_tree_structure(file_paths):
+_CODE_FENCE = re.compile(r"^\s*```[\w+-]*\s*\n(.*?)\n?```\s*$", re.DOTALL)
+
+def strip_code_fences(text):
     """
-    Converts a list of file paths ['src/utils/helper.py'] 
-    into the nested dictionary format required by streamlit-tree-select.
+    Removes a single surrounding markdown fence (```python ... ```) if the AI added one.
+    """
+    match = _CODE_FENCE.match(text)
+    return match.group(1) if match else text
+
+def build_tree(file_paths):
+    """
+    Converts a list of file paths ['src/utils/helper.py'] into the nested
+    node list required by streamlit-tree-select, in a single pass.
+    Each folder keeps a dict index of its children (a path trie), so
+    lookups are O(1) instead of a scan over siblings.
+
+    Returns (tree_nodes, all_values) where all_values lists every node
+    value (folders and files), e.g. for the "Expand Folders" control.
     """
+    with span("tree", files=len(file_paths)) as trace:
+        tree_nodes, all_values = _build_tree(file_paths)
+        trace.set(nodes=len(all_values))
+        return tree_nodes, all_values
+
+def _build_tree(file_paths):
     tree_nodes = []
+    all_values = []
+    root_index = {}
 
     for path in file_paths:
         parts = path.split('/')
-        current_level = tree_nodes
+        last = len(parts) - 1
+        current_level, current_index = tree_nodes, root_index
         current_full_path = ""
 
         for i, part in enumerate(parts):
             # Reconstruct the full path for unique IDs (e.g. "src/components")
             current_full_path = f"{current_full_path}/{part}" if current_full_path else part
-            
-            # Check if this node already exists at this level
-            existing_node = next((node for node in current_level if node['label'] == part), None)
-
-            if existing_node:
-                # If it's a folder, step inside its children
-                if 'children' in existing_node:
-                    current_level = existing_node['children']
-            else:
-                # Create new node
-                is_file = (i == len(parts) - 1)
-                
+
+            entry = current_index.get(part)
+            if entry is None:
                 new_node = {
                     "label": part,
                     "value": current_full_path,  # Unique ID
                     "showCheckbox": True         # Allow selecting files
                 }
-                
-                if not is_file:
+                current_level.append(new_node)
+                all_values.append(current_full_path)
+                if i == last:
+                    entry = (new_node, None)     # It's a file, no children
+                else:
                     new_node["children"] = []
-                    current_level.append(new_node)
-                    current_level = new_node["children"]  # Step inside
+                    entry = (new_node, {})
+                current_index[part] = entry
+
+            node, child_index = entry
+            if child_index is None:
+                break                            # A file can't have children
+            current_level, current_index = node["children"], child_index  # Step inside
+
+    return tree_nodes, all_values
+
+@lru_cache(maxsize=32)
+def _build_tree_cached(file_paths):
+    return build_tree(file_paths)
+
+def build_tree_cached(file_paths):
+    """
+    Memoized build_tree keyed on the file-set fingerprint (the tuple of paths),
+    so reruns that don't change the project reuse the same tree.
+    The returned lists are shared: treat them as read-only.
+    """
+    return _build_tree_cached(tuple(file_paths))
+
+def format_tree_structure(file_paths):
+    """
+    Converts a list of file paths ['src/utils/helper.py'] 
+    into the nested dictionary format required by streamlit-tree-select.
+    """
+    return build_tree(file_paths)[0]
+
+
+# --- STREAMING PARSER ---
+_STRING_SPECIAL = re.compile(r'["\\]')
+_WHITESPACE = " \t\r\n"
+
+class StreamingTreeParser:
+    """
+    Incremental parser for the AI's JSON folder structure.
+    Feed it raw text chunks as they arrive from the token stream;
+    every call to feed() returns the files (path, content) whose
+    closing quote has been seen, so the UI can show them immediately.
+    """
+
+    def __init__(self):
+        self.files = {}            # Every file emitted so far (path -> content)
+        self.done = False          # True once the root object is closed
+        self._state = "seek"       # seek | key | colon | value | after | skip | string
+        self._folders = []         # Folder names from the root to the current object
+        self._depth = 0            # Open JSON objects (root included)
+        self._key = None           # Last key read in the current object
+        self._skip_depth = 0       # Bracket depth inside a non-string, non-object value
+        self._string_purpose = None
+        self._string_parts = []
+        self._pending = ""         # Trailing escape char split across chunks
+
+    def feed(self, chunk):
+        """
+        Consumes one chunk of text and returns a list of newly completed (path, content) pairs.
+        """
+        buf = self._pending + chunk
+        self._pending = ""
+        completed = []
+        i, n = 0, len(buf)
+
+        while i < n and not self.done:
+            state = self._state
+
+            # 1. Inside a string: jump straight to the next quote or escape
+            if state == "string":
+                match = _STRING_SPECIAL.search(buf, i)
+                if not match:
+                    self._string_parts.append(buf[i:])
+                    i = n
+                    break
+                k = match.start()
+                if buf[k] == "\\":
+                    if k + 1 >= n:
+                        # Escape split across chunks, wait for the next one
+                        self._string_parts.append(buf[i:k])
+                        self._pending = buf[k:]
+                        i = n
+                        break
+                    self._string_parts.append(buf[i:k + 2])
+                    i = k + 2
+                    continue
+                self._string_parts.append(buf[i:k])
+                i = k + 1
+                self._finish_string(completed)
+                continue
+
+            ch = buf[i]
+
+            # 2. Before the root object: skip prose and ```json fences
+            if state == "seek":
+                start = buf.find("{", i)
+                if start == -1:
+                    i = n
+                    break
+                i = start + 1
+                self._depth = 1
+                self._state = "key"
+                continue
+
+            # 3. Non-string value (list, number, null): skip it entirely (AI error)
+            if state == "skip":
+                if ch == '"':
+                    self._start_string("skip")
+                elif ch in "[{":
+                    self._skip_depth += 1
+                elif ch in "]}":
+                    if self._skip_depth == 0 and ch == "}":
+                        self._close_object()
+                    else:
+                        self._skip_depth -= 1
+                elif ch == "," and self._skip_depth == 0:
+                    self._state = "key"
+                i += 1
+                continue
+
+            if ch in _WHITESPACE:
+                i += 1
+                continue
+
+            # 4. Structural characters
+            if state == "key":
+                if ch == '"':
+                    self._start_string("key")
+                elif ch == "}":
+                    self._close_object()
+            elif state == "colon":
+                if ch == ":":
+                    self._state = "value"
+            elif state == "value":
+                if ch == '"':
+                    self._start_string("value")
+                elif ch == "{":
+                    # It's a folder -> Dive deeper
+                    self._folders.append(self._key)
+                    self._depth += 1
+                    self._state = "key"
                 else:
-                    # It's a file, no children
-                    current_level.append(new_node)
-    
-    return tree_nodes
\ No newline at end of file
+                    self._skip_depth = 0
+                    self._state = "skip"
+                    continue
+            elif state == "after":
+                if ch == ",":
+                    self._state = "key"
+                elif ch == "}":
+                    self._close_object()
+            i += 1
+
+        return completed
+
+    def _start_string(self, purpose):
+        self._string_purpose = purpose
+        self._string_parts = []
+        self._state = "string"
+
+    def _finish_string(self, completed):
+        raw = "".join(self._string_parts)
+        self._string_parts = []
+        try:
+            text = json.loads(f'"{raw}"')
+        except json.JSONDecodeError:
+            text = raw
+
+        if self._string_purpose == "key":
+            self._key = text
+            self._state = "colon"
+        elif self._string_purpose == "value":
+            # It is a file! Save the content.
+            path = normalize_path(self._folders + [self._key])
+            if path:
+                self.files[path] = text
+                completed.append((path, text))
+            self._state = "after"
+        else:
+            self._state = "skip"
+
+    def _close_object(self):
+        self._depth -= 1
+        if self._depth == 0:
+            self.done = True
+        else:
+            self._folders.pop()
+            self._state = "after"
+
+
+# --- LINE-RECORD PROTOCOL ---
+def validate_record(record):
+    """
+    Checks one decoded line-record ({"path": ..., "content": ...}) and returns
+    (path, content) with the path normalized, or None if the record is invalid.
+    """
+    if not isinstance(record, dict):
+        return None
+    path, content = record.get("path"), record.get("content", "")
+    if not isinstance(path, str) or not isinstance(content, (str, type(None))):
+        return None
+    path = normalize_path([path])
+    if not path:
+        return None
+    return path, content or ""
+
+class RecordStreamParser:
+    """
+    Incremental parser for the line-record protocol: one JSON object per line,
+    {"path": "project/app.py", "content": "..."}, ending with {"done": true}.
+    Every line is decoded and validated on its own, so a truncated or malformed
+    record only loses that one file. Only the unfinished line is buffered.
+    """
+
+    def __init__(self):
+        self.files = {}            # Every file emitted so far (path -> content)
+        self.done = False          # True once the {"done": true} record arrived
+        self.rejected = 0          # Lines that were not valid records
+        self._parts = []           # Pieces of the current, unfinished line
+
+    def feed(self, chunk):
+        """
+        Consumes one chunk of text and returns a list of newly completed (path, content) pairs.
+        """
+        if "\n" not in chunk:
+            self._parts.append(chunk)
+            return []
+        lines = chunk.split("\n")
+        self._parts.append(lines[0])
+        lines[0] = "".join(self._parts)
+        self._parts = [lines.pop()]
+        completed = []
+        for line in lines:
+            record = self._record(line)
+            if record is not None:
+                completed.append(record)
+        return completed
+
+    def finish(self):
+        """
+        Parses the last line if the stream ended without a newline (a cut-off line is rejected).
+        """
+        line = "".join(self._parts)
+        self._parts = []
+        record = self._record(line)
+        return [record] if record is not None else []
+
+    def _record(self, line):
+        line = line.strip()
+        if not line or self.done or not line.startswith("{"):
+            return None  # Blank lines, code fences, stray prose, anything after "done"
+        try:
+            decoded = json.loads(line)
+        except json.JSONDecodeError:
+            self.rejected += 1
+            return None
+        if isinstance(decoded, dict) and decoded.get("done") is True:
+            self.done = True
+            return None
+        record = validate_record(decoded)
+        if record is None:
+            self.rejected += 1
+            return None
+        self.files[record[0]] = record[1]
+        return record
+
+def parse_records(raw_text, status=None):
+    """
+    Parses a complete line-record response into {path: content}.
+    Returns None only if not a single valid record was found.
+    If a dict is passed as `status`, status["truncated"] is True when the
+    closing {"done": true} record never arrived.
+    """
+    with span("parse", protocol="records", bytes_in=len(raw_text) if isinstance(raw_text, str) else 0) as trace:
+        if not isinstance(raw_text, str):
+            return None
+        parser = RecordStreamParser()
+        parser.feed(raw_text)
+        parser.finish()
+        trace.set(files=len(parser.files), rejected=parser.rejected, complete=parser.done)
+        if status is not None:
+            status["truncated"] = not parser.done
+        return parser.files or None
@@ -0,0 +1,99 @@
+"""
+Paged code viewer support for the Builder page.
+
+st.code() ships the whole string to the browser, which highlights it on
+every rerun, so large generated files are split into pages and only the
+current page is rendered. The split (and the detected language) is cached
+per (path, content hash), so reruns and page flips never re-scan the file.
+"""
+import threading
+from collections import OrderedDict, namedtuple
+
+from app.shared import process_singleton
+
+PAGE_LINES = 300
+
+# Language names understood by st.code (react-syntax-highlighter / Prism)
+LANGUAGE_BY_EXTENSION = {
+    "py": "python", "pyi": "python", "ipynb": "json",
+    "js": "javascript", "mjs": "javascript", "cjs": "javascript", "jsx": "jsx",
+    "ts": "typescript", "tsx": "tsx",
+    "html": "html", "htm": "html", "css": "css", "scss": "scss", "sass": "sass", "less": "less",
+    "vue": "markup", "svelte": "markup", "xml": "xml", "svg": "xml",
+    "json": "json", "yaml": "yaml", "yml": "yaml", "toml": "toml", "ini": "ini", "cfg": "ini", "env": "bash",
+    "md": "markdown", "rst": "text", "txt": "text",
+    "sh": "bash", "bash": "bash", "zsh": "bash", "ps1": "powershell", "bat": "batch",
+    "sql": "sql", "graphql": "graphql", "gql": "graphql", "proto": "protobuf",
+    "java": "java", "kt": "kotlin", "kts": "kotlin", "scala": "scala", "groovy": "groovy", "gradle": "groovy",
+    "c": "c", "h": "c", "cpp": "cpp", "cc": "cpp", "hpp": "cpp", "cs": "csharp",
+    "go": "go", "rs": "rust", "rb": "ruby", "php": "php", "swift": "swift", "dart": "dart",
+    "r": "r", "lua": "lua", "pl": "perl", "ex": "elixir", "exs": "elixir", "erl": "erlang", "hs": "haskell",
+    "tf": "hcl", "hcl": "hcl", "dockerfile": "docker",
+}
+
+# Extension-less files recognised by name
+LANGUAGE_BY_FILENAME = {
+    "Dockerfile": "docker", "Makefile": "makefile", "Procfile": "bash", "Jenkinsfile": "groovy",
+    "Gemfile": "ruby", "Rakefile": "ruby", ".gitignore": "bash", ".dockerignore": "bash", ".env": "bash",
+}
+
+CodePages = namedtuple("CodePages", "language pages total_lines")
+
+
+def detect_language(path):
+    """
+    st.code language for a file path, from its name or extension ("text" if unknown).
+    """
+    name = path.rsplit("/", 1)[-1]
+    language = LANGUAGE_BY_FILENAME.get(name)
+    if language:
+        return language
+    stem, dot, extension = name.rpartition(".")
+    if not dot or not stem:
+        return "text"
+    return LANGUAGE_BY_EXTENSION.get(extension.lower(), "text")
+
+def split_pages(content, page_lines=PAGE_LINES):
+    """
+    Splits text into chunks of at most `page_lines` lines.
+    """
+    lines = content.splitlines(keepends=True)
+    if not lines:
+        return [""], 0
+    pages = ["".join(lines[i:i + page_lines]).rstrip("\n") for i in range(0, len(lines), page_lines)]
+    return pages, len(lines)
+
+
+class PageCache:
+    """
+    Thread-safe LRU of CodePages keyed by (path, content hash, page size).
+    """
+
+    def __init__(self, max_entries=64):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_pages(self, path, digest, load_content, page_lines=PAGE_LINES):
+        """
+        CodePages for a file. `load_content()` is only called on a miss.
+        """
+        key = (path, digest, page_lines)
+        with self._lock:
+            pages = self._entries.get(key)
+            if pages is not None:
+                self._entries.move_to_end(key)
+                return pages
+
+        split, total_lines = split_pages(load_content(), page_lines)
+        pages = CodePages(detect_language(path), split, total_lines)
+        with self._lock:
+            self._entries[key] = pages
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return pages
+
+
+@process_singleton
+def get_page_cache():
+    return PageCache()
@@ -0,0 +1,123 @@
+"""
+Local stand-in for the Hugging Face chat-completion endpoint.
+
+Replays a fixed (recorded or synthetic) response with configurable latency,
+in both normal and streaming (SSE) mode, so get_ai_response and
+stream_ai_response can run without network:
+
+    with MockInferenceServer(make_response(200), latency=0.5) as server:
+        raw = get_ai_response("x", api_key="mock", model=server.url)
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class MockInferenceServer:
+
+    def __init__(self, response_text, latency=0.0, chunk_size=64, chunk_delay=0.0, status=200):
+        self.response_text = response_text
+        self.latency = latency          # Seconds before the first byte (model "thinking")
+        self.chunk_size = chunk_size    # Characters per streamed delta
+        self.chunk_delay = chunk_delay  # Seconds between streamed deltas
+        self.status = status            # e.g. 503 to simulate a cold start
+        self.requests = 0
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @classmethod
+    def from_recording(cls, path, **kwargs):
+        """
+        Replays a recorded raw model answer saved as a text file.
+        """
+        with open(path, encoding="utf-8") as handle:
+            return cls(handle.read(), **kwargs)
+
+    @property
+    def url(self):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _handler(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                mock.requests += 1
+                length = int(self.headers.get("Content-Length", 0))
+                request = json.loads(self.rfile.read(length) or b"{}")
+                time.sleep(mock.latency)
+
+                if mock.status != 200:
+                    self._send_json(mock.status, {"error": f"Mock status {mock.status}"})
+                    return
+                if request.get("stream"):
+                    self._stream(request)
+                else:
+                    self._send_json(200, self._completion(request))
+
+            def _completion(self, request):
+                text = mock.response_text
+                return {
+                    "id": "mock", "object": "chat.completion", "created": int(time.time()),
+                    "model": request.get("model") or "mock",
+                    "system_fingerprint": "mock",
+                    "choices": [{
+                        "index": 0, "finish_reason": "stop", "logprobs": None,
+                        "message": {"role": "assistant", "content": text},
+                    }],
+                    "usage": {
+                        "prompt_tokens": sum(len(m.get("content", "")) for m in request.get("messages", [])) // 4,
+                        "completion_tokens": len(text) // 4,
+                        "total_tokens": 0,
+                    },
+                }
+
+            def _stream(self, request):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.end_headers()
+                text = mock.response_text
+                for start in range(0, len(text), mock.chunk_size):
+                    event = {
+                        "id": "mock", "object": "chat.completion.chunk", "created": int(time.time()),
+                        "model": request.get("model") or "mock", "system_fingerprint": "mock",
+                        "choices": [{
+                            "index": 0, "finish_reason": None, "logprobs": None,
+                            "delta": {"role": "assistant", "content": text[start:start + mock.chunk_size]},
+                        }],
+                    }
+                    self.wfile.write(f"data: {json.dumps(event)}\n\n".encode("utf-8"))
+                    if mock.chunk_delay:
+                        time.sleep(mock.chunk_delay)
+                self.wfile.write(b"data: [DONE]\n\n")
+
+            def _send_json(self, status, payload):
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        return Handler
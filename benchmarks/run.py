@@ -0,0 +1,150 @@
+"""
+Offline benchmark suite.
+
+Measures the hot paths (parse_ai_response, the tree builder, create_in_memory_zip
+and, optionally, get_ai_response against the local mock server) at several
+project sizes, then compares against a saved baseline.
+
+    python -m benchmarks.run                        # run and compare with benchmarks/baseline.json
+    python -m benchmarks.run --save-baseline        # record a new baseline
+    python -m benchmarks.run --sizes 10 100 --e2e   # include the mock-server round trip
+"""
+import argparse
+import json
+import math
+import os
+import sys
+import time
+import tracemalloc
+
+from app.utils import parse_ai_response, build_tree, format_tree_structure
+from core.creator import create_in_memory_zip
+from benchmarks.synthetic import make_response, make_files
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+DEFAULT_SIZES = [10, 100, 1000, 10000]
+# A slowdown smaller than this (absolute p50 difference) is never a regression
+MIN_DELTA_MS = 0.5
+
+def percentile(samples, pct):
+    """
+    Nearest-rank percentile of a list of numbers.
+    """
+    ordered = sorted(samples)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+def measure(fn, files, budget_seconds=1.0, min_runs=5, max_runs=200):
+    """
+    Times fn() repeatedly within a time budget, then once more under tracemalloc.
+    """
+    fn()  # Warm-up (imports, caches)
+    samples = []
+    started = time.perf_counter()
+    while len(samples) < max_runs and (len(samples) < min_runs or time.perf_counter() - started < budget_seconds):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    p50 = percentile(samples, 50)
+    return {
+        "runs": len(samples),
+        "p50_ms": round(p50 * 1000, 3),
+        "p99_ms": round(percentile(samples, 99) * 1000, 3),
+        "files_per_s": round(files / p50) if p50 else None,
+        "peak_kb": round(peak / 1024, 1),
+    }
+
+def build_cases(sizes, e2e, depth=3, file_lines=20, latency=0.0):
+    """
+    Yields (name, size, fn) for every benchmark case.
+    """
+    if e2e:
+        from app.api_handler import get_ai_response
+        from benchmarks.mock_server import MockInferenceServer
+
+    for size in sizes:
+        raw = make_response(size, depth=depth, file_lines=file_lines)
+        files = make_files(size, depth=depth, file_lines=file_lines)
+        paths = list(files)
+        yield "parse_ai_response", size, lambda raw=raw: parse_ai_response(raw)
+        yield "build_tree", size, lambda paths=paths: build_tree(paths)
+        yield "format_tree_structure", size, lambda paths=paths: format_tree_structure(paths)
+        yield "create_in_memory_zip", size, lambda files=files: create_in_memory_zip(files)
+        if e2e:
+            # One server per case: the generator resumes (and stops it) after the case is measured
+            with MockInferenceServer(raw, latency=latency) as server:
+                yield "get_ai_response_mock", size, lambda url=server.url: get_ai_response("benchmark", api_key="mock", model=url)
+
+def compare(results, baseline, threshold, min_delta_ms=MIN_DELTA_MS):
+    """
+    Returns the list of cases whose p50 got slower than `threshold` x the baseline
+    and by more than `min_delta_ms` (sub-millisecond cases jitter well past any ratio).
+    """
+    regressions = []
+    for key, current in results.items():
+        previous = baseline.get(key)
+        if not previous or not previous.get("p50_ms"):
+            continue
+        ratio = current["p50_ms"] / previous["p50_ms"]
+        if ratio > threshold and current["p50_ms"] - previous["p50_ms"] > min_delta_ms:
+            regressions.append((key, previous["p50_ms"], current["p50_ms"], ratio))
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="AI Architect offline benchmarks.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="File counts to benchmark")
+    parser.add_argument("--budget", type=float, default=1.0, help="Seconds spent per case")
+    parser.add_argument("--depth", type=int, default=3, help="Maximum folder nesting of the synthetic projects")
+    parser.add_argument("--file-lines", type=int, default=20, help="Lines per synthetic file")
+    parser.add_argument("--e2e", action="store_true", help="Also run get_ai_response against the local mock server")
+    parser.add_argument("--latency", type=float, default=0.0, help="Mock server latency in seconds (with --e2e)")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="Write these results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=1.25, help="Allowed p50 slowdown vs baseline")
+    parser.add_argument("--min-delta-ms", type=float, default=MIN_DELTA_MS, help="Ignore p50 slowdowns smaller than this many ms")
+    parser.add_argument("--json", help="Also write results to this JSON file")
+    args = parser.parse_args(argv)
+
+    # 1. Run
+    results = {}
+    print(f"{'case':<26}{'files':>7}{'runs':>6}{'p50 ms':>11}{'p99 ms':>11}{'files/s':>12}{'peak KB':>11}")
+    for name, size, fn in build_cases(args.sizes, args.e2e, args.depth, args.file_lines, args.latency):
+        stats = measure(fn, size, budget_seconds=args.budget)
+        results[f"{name}/{size}"] = stats
+        print(f"{name:<26}{size:>7}{stats['runs']:>6}{stats['p50_ms']:>11.3f}{stats['p99_ms']:>11.3f}"
+              f"{stats['files_per_s'] or 0:>12}{stats['peak_kb']:>11.1f}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as handle:
+            json.dump(results, handle, indent=2)
+
+    # 2. Baseline
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as handle:
+            json.dump(results, handle, indent=2, sort_keys=True)
+        print(f"\nBaseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("\nNo baseline found. Run with --save-baseline to create one.")
+        return 0
+
+    with open(args.baseline, encoding="utf-8") as handle:
+        baseline = json.load(handle)
+    regressions = compare(results, baseline, args.threshold, args.min_delta_ms)
+    if not regressions:
+        print(f"\nNo regressions (threshold {args.threshold}x p50, at least {args.min_delta_ms} ms slower).")
+        return 0
+    print("\nREGRESSIONS:")
+    for key, before, after, ratio in regressions:
+        print(f"  {key}: {before:.3f} ms -> {after:.3f} ms ({ratio:.2f}x)")
+    return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
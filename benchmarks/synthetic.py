@@ -0,0 +1,37 @@
+import json
+import random
+
+def make_structure(file_count, depth=3, file_lines=20, seed=0):
+    """
+    Builds a nested folder dict with `file_count` files spread over folders
+    `depth` levels deep, shaped like a real "Working Code" answer.
+    """
+    rng = random.Random(seed)
+    root = {}
+    project = root.setdefault("project", {})
+    for i in range(file_count):
+        folder = project
+        for level in range(rng.randint(0, depth)):
+            folder = folder.setdefault(f"pkg{rng.randint(0, 7)}_{level}", {})
+        body = "\n".join(
+            f"def func_{i}_{line}(x):\n    return {{'value': x + {line}}}" for line in range(file_lines // 2)
+        )
+        folder[f"module_{i}.py"] = f"import os\n\n{body}\n"
+    return root
+
+def make_response(file_count, depth=3, file_lines=20, seed=0, wrap=True):
+    """
+    Serializes a synthetic structure the way the model answers: optional prose
+    and a ```json fence around the object.
+    """
+    body = json.dumps(make_structure(file_count, depth, file_lines, seed), indent=2)
+    if not wrap:
+        return body
+    return f"Here is your project structure:\n```json\n{body}\n```\nLet me know if you need changes!"
+
+def make_files(file_count, depth=3, file_lines=20, seed=0):
+    """
+    The flattened {path: content} dict that parse_ai_response would return.
+    """
+    from app.utils import flatten_structure
+    return flatten_structure(make_structure(file_count, depth, file_lines, seed))
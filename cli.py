@@ -0,0 +1,221 @@
+"""
+Headless batch generator.
+
+Reads prompts from a JSONL file (one {"id", "prompt", "complexity", "model"} object
+per line, only "prompt" is required) and generates every blueprint across a worker
+pool, writing ZIPs or directory trees to disk plus one metrics line per job.
+
+    python cli.py prompts.jsonl --out build/ --concurrency 8 --format zip --resume
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+from dotenv import load_dotenv
+
+from app import tracing
+from app.api_handler import get_ai_response, extract_error, prompt_version, DEFAULT_MODEL, PROTOCOLS, PROTOCOL_JSON
+from app.cache import get_default_cache, make_cache_key
+from app.jobs import JobManager
+from app.library import get_library, REUSE_SIMILARITY
+from app.planner import AUTO_MODEL
+from app.pipeline import parse_output
+from app.singleflight import get_single_flight
+from core.creator import write_zip
+from core.materializer import check_path, materialize, UnsafePathError
+
+def load_prompts(path, default_complexity, default_model):
+    """
+    Parses the prompt catalogue. Lines without an "id" get one from their line number.
+    Ids name the output files, so they must be unique relative paths (ValueError otherwise).
+    """
+    prompts = []
+    seen = set()
+    with open(path, encoding="utf-8") as handle:
+        for line_no, line in enumerate(handle, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            try:
+                job_id = check_path(str(record.get("id") or f"{line_no:05d}"))
+            except UnsafePathError as e:
+                raise ValueError(f"Invalid id on line {line_no} of {path}: {e}") from e
+            if job_id in seen:
+                raise ValueError(f"Duplicate id {job_id!r} on line {line_no} of {path}")
+            seen.add(job_id)
+            prompts.append({
+                "id": job_id,
+                "prompt": record["prompt"],
+                "complexity": record.get("complexity", default_complexity),
+                "model": record.get("model", default_model),
+            })
+    return prompts
+
+def load_completed(metrics_path):
+    """
+    Ids that already finished successfully in a previous (partial) run.
+    """
+    completed = set()
+    if not os.path.exists(metrics_path):
+        return completed
+    with open(metrics_path, encoding="utf-8") as handle:
+        for line in handle:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # Half-written line from an interrupted run
+            if record.get("ok") and record.get("complete", True):
+                completed.add(record["id"])
+    return completed
+
+def write_output(files, out_dir, job_id, output_format, incremental=False):
+    if output_format == "zip":
+        target = os.path.join(out_dir, f"{job_id}.zip")
+        os.makedirs(os.path.dirname(target), exist_ok=True)  # Ids may contain folders ("team/app")
+        temp = target + ".part"
+        with open(temp, "wb") as handle:
+            write_zip(files, handle)
+        os.replace(temp, target)  # Only complete archives ever carry the final name
+    else:
+        materialize(files, os.path.join(out_dir, job_id), incremental=incremental, prune=incremental)
+
+def run_one(job, item, api_key, out_dir, output_format, cache, incremental=False, library=None,
+            reuse_similarity=REUSE_SIMILARITY, protocol=PROTOCOL_JSON):
+    """
+    One catalogue entry: get_ai_response -> parse_output -> write to disk.
+    With a library, a near-identical earlier blueprint is reused instead, and new ones are added.
+    Returns the metrics record.
+    """
+    start = time.perf_counter()
+    usage = {}
+    cache_key = make_cache_key(item["prompt"], item["complexity"], item["model"], prompt_version(protocol))
+    files = cache.get(cache_key) if cache is not None else None
+    cache_hit = files is not None
+    library_id = None
+    if files is None and library is not None:
+        match = library.find_similar(item["prompt"], item["complexity"], threshold=reuse_similarity)
+        if match is not None:
+            files = library.get(match.id)
+            library_id = match.id
+    coalesced = False
+    complete = True
+    error = None
+
+    if files is None:
+        def infer():
+            raw = get_ai_response(item["prompt"], api_key=api_key, complexity=item["complexity"], model=item["model"],
+                                  usage=usage, protocol=protocol)
+            error = extract_error(raw)
+            status = {}
+            files = None if error else parse_output(raw, protocol, status)
+            # Output repaired after a cut-off is written, but never cached or shared
+            complete = bool(files) and not status.get("truncated")
+            if complete and cache is not None:
+                cache.set(cache_key, files)
+            if complete and library is not None:
+                library.add(item["prompt"], item["complexity"], item["model"], files, metadata={"source": "cli"}, key=cache_key)
+            return files, complete, error
+
+        # Duplicate prompts in the batch share one in-flight model call
+        (files, complete, error), coalesced = get_single_flight().do(cache_key, infer)
+    inference_seconds = time.perf_counter() - start
+
+    if files:
+        write_output(files, out_dir, item["id"], output_format, incremental)
+    elif error is None:
+        error = "Could not parse AI response"
+
+    return {
+        "id": item["id"],
+        "ok": bool(files),
+        "parsed": bool(files),
+        "complete": bool(files) and complete,
+        "cache_hit": cache_hit,
+        "coalesced": coalesced,
+        "library_id": library_id,
+        "files": len(files) if files else 0,
+        "latency_s": round(time.perf_counter() - start, 3),
+        "inference_s": round(inference_seconds, 3),
+        "prompt_tokens": usage.get("prompt_tokens"),
+        "completion_tokens": usage.get("completion_tokens"),
+        "error": error,
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate many AI Architect blueprints in parallel.")
+    parser.add_argument("input", help="JSONL file with one prompt object per line")
+    parser.add_argument("--out", default="blueprints", help="Output directory (default: blueprints)")
+    parser.add_argument("--format", choices=["zip", "dir"], default="zip", help="Write ZIP archives or directory trees")
+    parser.add_argument("--concurrency", type=int, default=4, help="Maximum generations in flight")
+    parser.add_argument("--complexity", default="Working Code", choices=["Structure Only", "Simple Code", "Working Code"])
+    parser.add_argument("--model", default=DEFAULT_MODEL, help=f"Model ID, or \"{AUTO_MODEL}\" to let the planner route each prompt")
+    parser.add_argument("--metrics", help="Metrics JSONL path (default: <out>/metrics.jsonl)")
+    parser.add_argument("--resume", action="store_true", help="Skip prompts that already succeeded in the metrics file")
+    parser.add_argument("--trace", action="store_true", help="Log per-stage spans and write Prometheus metrics to $AI_ARCHITECT_METRICS_FILE")
+    parser.add_argument("--incremental", action="store_true", help="With --format dir, only rewrite files that changed since the last run")
+    parser.add_argument("--protocol", choices=PROTOCOLS, default=PROTOCOL_JSON, help="Model output format; line records survive truncation")
+    parser.add_argument("--library", action="store_true", help="Reuse near-identical blueprints from the shared library and add new ones to it")
+    parser.add_argument("--reuse-similarity", type=float, default=REUSE_SIMILARITY, help="Prompt similarity (0-1) needed to reuse a library blueprint")
+    parser.add_argument("--no-cache", action="store_true", help="Always call the model, never reuse cached blueprints")
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+    if args.trace:
+        tracing.enable()
+    api_key = os.environ.get("HF_TOKEN")
+    if not api_key:
+        print("HF_TOKEN is not set (environment or .env).", file=sys.stderr)
+        return 2
+
+    os.makedirs(args.out, exist_ok=True)
+    metrics_path = args.metrics or os.path.join(args.out, "metrics.jsonl")
+    try:
+        prompts = load_prompts(args.input, args.complexity, args.model)
+    except ValueError as e:
+        print(f"Invalid prompt catalogue: {e}", file=sys.stderr)
+        return 2
+    if args.resume:
+        completed = load_completed(metrics_path)
+        prompts = [item for item in prompts if item["id"] not in completed]
+    cache = None if args.no_cache else get_default_cache()
+    library = get_library() if args.library else None
+
+    # 1. Queue every prompt; the pool size is the global concurrency limit.
+    #    Each job appends its own metrics line as soon as it finishes, so an
+    #    interrupted batch can be resumed without redoing finished work.
+    manager = JobManager(max_workers=args.concurrency, per_owner_limit=len(prompts) + 1, max_jobs_kept=len(prompts) + 1)
+    write_lock = threading.Lock()
+    results = []
+    with open(metrics_path, "a", encoding="utf-8") as metrics:
+        def record_job(job, item):
+            try:
+                record = run_one(job, item, api_key, args.out, args.format, cache, args.incremental,
+                                 library, args.reuse_similarity, args.protocol)
+            except Exception as e:
+                record = {"id": item["id"], "ok": False, "error": str(e)}
+            line = json.dumps(record)
+            with write_lock:
+                metrics.write(line + "\n")
+                metrics.flush()
+                results.append(record)
+                print(line)
+            return record
+
+        job_ids = [manager.submit("batch", record_job, item) for item in prompts]
+
+        # 2. Wait for the whole batch
+        for job_id in job_ids:
+            manager.wait(job_id)
+
+    failures = sum(1 for record in results if not record["ok"])
+    manager.shutdown()
+    tracing.write_prometheus()
+    print(f"Done: {len(prompts) - failures}/{len(prompts)} succeeded.", file=sys.stderr)
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
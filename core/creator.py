@@ -1,22 +1,206 @@
-import io
+import hashlib
+import struct
+import threading
+import time
 import zipfile
+import zlib
+from collections import OrderedDict, namedtuple
 
-def create_in_memory_zip(file_data: dict) -> bytes:
-    zip_buffer = io.BytesIO()
-    
-    with zipfile.ZipFile(zip_buffer, "w", zipfile.ZIP_DEFLATED) as zip_file:
+from app.shared import process_singleton
+from app.tracing import span
+
+# Watermark prepended to every exported file
+HEADER_TEMPLATE = "\"\"\"\nGenerated by AI Project Architect\nAuthor: VishwarajKhatpe\nPath: {path}\n\"\"\"\n\n"
+
+# Compression presets offered in the UI: label -> (method, compresslevel)
+COMPRESSION_PRESETS = {
+    "Balanced (Deflate 6)": (zipfile.ZIP_DEFLATED, 6),
+    "Fast (Deflate 1)": (zipfile.ZIP_DEFLATED, 1),
+    "Smallest (Deflate 9)": (zipfile.ZIP_DEFLATED, 9),
+    "None (Stored)": (zipfile.ZIP_STORED, None),
+}
+
+# One compressed archive member, independent of its position in the archive
+ZipEntry = namedtuple("ZipEntry", "name crc compressed size method")
+
+_LOCAL_HEADER = struct.Struct("<IHHHHHIIIHH")
+_CENTRAL_HEADER = struct.Struct("<IHHHHHHIIIHHHHHII")
+_END_OF_CENTRAL_DIR = struct.Struct("<IHHHHIIH")
+_UTF8_FLAG = 0x800
+_ZIP_VERSION = 20
+_MAX_ZIP32 = 0xFFFFFFFF
+
+
+class ZipEntryCache:
+    """
+    Thread-safe LRU of compressed entries, keyed by (path, content hash, method, level).
+    Passing the same cache to several exports means unchanged files are never recompressed.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, entry):
+        with self._lock:
+            if key in self._entries:
+                return
+            self._entries[key] = entry
+            self._bytes += len(entry.compressed)
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted.compressed)
+
+
+@process_singleton
+def get_entry_cache():
+    # One budget for the whole process: entries are keyed by content, so sessions can share them
+    return ZipEntryCache()
+
+
+def _clean_path(path):
+    return path.strip().lstrip("/")
+
+def _file_bytes(clean_path, content):
+    # Safety Check: If content is NOT a string, force it to be one
+    if not isinstance(content, str):
+        content = str(content)
+    return (HEADER_TEMPLATE.format(path=clean_path) + content).encode("utf-8")
+
+def compress_entry(path, content, method=zipfile.ZIP_DEFLATED, compresslevel=None, entry_cache=None):
+    """
+    Watermarks and compresses one file. Reuses a previous result from `entry_cache` when possible.
+    """
+    clean_path = _clean_path(path)
+    data = _file_bytes(clean_path, content)
+
+    key = None
+    if entry_cache is not None:
+        key = (clean_path, hashlib.sha1(data).digest(), method, compresslevel)
+        cached = entry_cache.get(key)
+        if cached is not None:
+            return cached
+
+    if method == zipfile.ZIP_STORED:
+        compressed = data
+    else:
+        level = -1 if compresslevel is None else compresslevel
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+        compressed = compressor.compress(data) + compressor.flush()
+
+    entry = ZipEntry(clean_path, zlib.crc32(data), compressed, len(data), method)
+    if key is not None:
+        entry_cache.put(key, entry)
+    return entry
+
+def _dos_timestamp(timestamp):
+    t = time.localtime(timestamp)
+    dos_date = (max(t.tm_year, 1980) - 1980) << 9 | t.tm_mon << 5 | t.tm_mday
+    dos_time = t.tm_hour << 11 | t.tm_min << 5 | t.tm_sec // 2
+    return dos_time, dos_date
+
+def iter_zip_entries(entries, timestamp=None):
+    """
+    Streams a ZIP archive built from already-compressed entries.
+    Yields one chunk per member (local header + data), then the central directory.
+    """
+    dos_time, dos_date = _dos_timestamp(time.time() if timestamp is None else timestamp)
+    central = []
+    offset = 0
+
+    for entry in entries:
+        name = entry.name.encode("utf-8")
+        local_header = _LOCAL_HEADER.pack(
+            0x04034B50, _ZIP_VERSION, _UTF8_FLAG, entry.method, dos_time, dos_date,
+            entry.crc, len(entry.compressed), entry.size, len(name), 0
+        )
+        central.append(_CENTRAL_HEADER.pack(
+            0x02014B50, (3 << 8) | _ZIP_VERSION, _ZIP_VERSION, _UTF8_FLAG, entry.method, dos_time, dos_date,
+            entry.crc, len(entry.compressed), entry.size, len(name), 0, 0, 0, 0, 0o644 << 16, offset
+        ) + name)
+        chunk = local_header + name + entry.compressed
+        offset += len(chunk)
+        if offset > _MAX_ZIP32 or len(central) > 0xFFFF:
+            raise ValueError("Project is too large for a standard ZIP archive.")
+        yield chunk
+
+    directory = b"".join(central)
+    yield directory + _END_OF_CENTRAL_DIR.pack(
+        0x06054B50, 0, 0, len(central), len(central), len(directory), offset, 0
+    )
+
+def iter_zip_chunks(file_data: dict, method=zipfile.ZIP_DEFLATED, compresslevel=None, entry_cache=None):
+    """
+    Streaming export: compresses and yields the archive file by file, so the
+    whole ZIP never has to sit in memory. Use ZIP_STORED to skip compression.
+    """
+    entries = (
+        compress_entry(path, content, method, compresslevel, entry_cache)
+        for path, content in file_data.items()
+    )
+    return iter_zip_entries(entries)
+
+def write_zip(file_data: dict, fileobj, method=zipfile.ZIP_DEFLATED, compresslevel=None, entry_cache=None):
+    """
+    Writes the archive chunk by chunk into an open binary file object. Returns bytes written.
+    """
+    written = 0
+    for chunk in iter_zip_chunks(file_data, method, compresslevel, entry_cache):
+        fileobj.write(chunk)
+        written += len(chunk)
+    return written
+
+def create_in_memory_zip(file_data: dict, method=zipfile.ZIP_DEFLATED, compresslevel=None, entry_cache=None) -> bytes:
+    with span("zip", files=len(file_data)) as trace:
+        archive = b"".join(iter_zip_chunks(file_data, method, compresslevel, entry_cache))
+        trace.set(bytes_out=len(archive))
+        return archive
+
+
+class ZipBuilder:
+    """
+    Lazy, memoized archive builder for the Builder page.
+    Whole archives are cached by a fingerprint of (paths, contents, header
+    template, compression); individual compressed entries are cached too, so
+    changing the selection only compresses newly added files.
+    There is one builder per session: by default it keeps only its latest archive
+    and shares the process-wide entry cache (get_entry_cache).
+    """
+
+    def __init__(self, entry_cache=None, max_archives=1):
+        self.entry_cache = entry_cache if entry_cache is not None else get_entry_cache()
+        self.max_archives = max_archives
+        self._archives = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def fingerprint(file_data: dict, method=zipfile.ZIP_DEFLATED, compresslevel=None):
+        digest = hashlib.sha1(repr((HEADER_TEMPLATE, method, compresslevel)).encode("utf-8"))
         for path, content in file_data.items():
-            # Safety Check: If content is NOT a string, force it to be one
-            if not isinstance(content, str):
-                content = str(content)
-
-            clean_path = path.strip().lstrip("/")
-            
-            # Watermark
-            header = f"\"\"\"\nGenerated by AI Project Architect\nAuthor: VishwarajKhatpe\nPath: {clean_path}\n\"\"\"\n\n"
-            full_content = header + content
-            
-            zip_file.writestr(clean_path, full_content)
-            
-    zip_buffer.seek(0)
-    return zip_buffer.getvalue()
\ No newline at end of file
+            digest.update(path.encode("utf-8", "surrogatepass") + b"\0")
+            digest.update(hashlib.sha1(str(content).encode("utf-8", "surrogatepass")).digest())
+        return digest.hexdigest()
+
+    def build(self, file_data: dict, method=zipfile.ZIP_DEFLATED, compresslevel=None) -> bytes:
+        key = self.fingerprint(file_data, method, compresslevel)
+        with self._lock:
+            archive = self._archives.get(key)
+            if archive is not None:
+                self._archives.move_to_end(key)
+                return archive
+
+        archive = create_in_memory_zip(file_data, method, compresslevel, self.entry_cache)
+        with self._lock:
+            self._archives[key] = archive
+            while len(self._archives) > self.max_archives:
+                self._archives.popitem(last=False)
+        return archive
@@ -0,0 +1,133 @@
+import hashlib
+import json
+import os
+import posixpath
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from app.tracing import span
+from core.creator import _clean_path, _file_bytes
+
+# Written next to the project in incremental mode: {path: content hash}
+MANIFEST_NAME = ".ai_architect_manifest.json"
+
+
+class UnsafePathError(ValueError):
+    """Raised when a generated path would land outside the target directory."""
+
+
+def check_path(path):
+    """
+    Validates one generated path and returns it normalized (forward slashes, no leading "/").
+    Rejects absolute paths, drive letters and ".." components.
+    """
+    raw = path.strip().replace("\\", "/")
+    if raw.startswith("/") or (len(raw) > 1 and raw[1] == ":"):
+        raise UnsafePathError(f"Absolute path in blueprint: {path!r}")
+    parts = raw.split("/")
+    if ".." in parts:
+        raise UnsafePathError(f"Parent reference in blueprint path: {path!r}")
+    clean = posixpath.normpath(raw)
+    if clean in ("", "."):
+        raise UnsafePathError(f"Empty blueprint path: {path!r}")
+    return clean
+
+def load_manifest(target_dir):
+    try:
+        with open(os.path.join(target_dir, MANIFEST_NAME), encoding="utf-8") as handle:
+            return json.load(handle)
+    except (OSError, ValueError):
+        return {}
+
+def _atomic_write(full_path, data):
+    # Temp file in the same directory, so os.replace is an atomic rename
+    temp = os.path.join(os.path.dirname(full_path), f".{os.path.basename(full_path)}.{uuid.uuid4().hex[:8]}.tmp")
+    try:
+        with open(temp, "wb") as handle:
+            handle.write(data)
+        os.replace(temp, full_path)
+    except BaseException:
+        if os.path.exists(temp):
+            os.remove(temp)
+        raise
+
+def _leaf_dirs(dirs):
+    """
+    Drops directories that are parents of another one: makedirs on the leaves creates them anyway.
+    """
+    leaves = []
+    for directory in sorted(dirs, reverse=True):
+        if not leaves or not leaves[-1].startswith(directory + os.sep):
+            leaves.append(directory)
+    return leaves
+
+def materialize(file_data: dict, target_dir, max_workers=8, check_paths=True, incremental=False,
+                prune=False, watermark=True):
+    """
+    Writes the flattened {path: content} dict straight into `target_dir`,
+    with the same file bytes the ZIP export would contain (no ZIP round trip).
+
+    1. Paths are validated (check_paths) so nothing is written outside target_dir.
+    2. Directories are created once, up front.
+    3. Files are written in parallel, each via a temp file + os.replace, so a
+       reader never sees a half-written file.
+    4. With incremental=True, files whose content hash matches the manifest of
+       the previous run are skipped; prune=True also deletes files that were in
+       the previous manifest but are no longer in the blueprint.
+
+    Returns {"written", "skipped", "removed", "dirs"} counts.
+    """
+    with span("materialize", files=len(file_data)) as trace:
+        target_dir = os.path.abspath(target_dir)
+
+        # 1. Resolve paths and bytes
+        planned = {}
+        for path, content in file_data.items():
+            clean_path = check_path(path) if check_paths else _clean_path(path)
+            data = _file_bytes(clean_path, content) if watermark else str(content).encode("utf-8")
+            planned[clean_path] = data
+
+        # 2. Incremental: skip unchanged files
+        previous = load_manifest(target_dir) if incremental or prune else {}
+        manifest = {}
+        to_write = []
+        for clean_path, data in planned.items():
+            digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+            manifest[clean_path] = digest
+            full_path = os.path.join(target_dir, *clean_path.split("/"))
+            if previous.get(clean_path) == digest and os.path.isfile(full_path):
+                continue
+            to_write.append((full_path, data))
+
+        # 3. Directories in one pass
+        leaves = _leaf_dirs({os.path.dirname(full_path) for full_path, _ in to_write} | {target_dir})
+        for directory in leaves:
+            os.makedirs(directory, exist_ok=True)
+
+        # 4. Parallel atomic writes
+        if len(to_write) > 1 and max_workers > 1:
+            with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="materialize") as pool:
+                list(pool.map(lambda item: _atomic_write(*item), to_write))
+        else:
+            for full_path, data in to_write:
+                _atomic_write(full_path, data)
+
+        # 5. Prune files dropped since the last run, then record the manifest
+        removed = 0
+        if prune:
+            for clean_path in set(previous) - set(manifest):
+                full_path = os.path.join(target_dir, *check_path(clean_path).split("/"))
+                if os.path.isfile(full_path):
+                    os.remove(full_path)
+                    removed += 1
+        if incremental or prune:
+            _atomic_write(os.path.join(target_dir, MANIFEST_NAME), json.dumps(manifest, indent=0).encode("utf-8"))
+
+        stats = {
+            "written": len(to_write),
+            "skipped": len(planned) - len(to_write),
+            "removed": removed,
+            "dirs": len(leaves),
+        }
+        trace.set(bytes_out=sum(len(data) for _, data in to_write), **stats)
+        return stats
@@ -1,104 +1,165 @@
 import streamlit as st
+import os
 import time
 from streamlit_option_menu import option_menu
-from streamlit_tree_select import tree_select
-from app.api_handler import get_ai_response
-from app.utils import parse_ai_response
-from core.creator import create_in_memory_zip
+import uuid
+from app.api_handler import DEFAULT_MODEL, PROTOCOLS, PROTOCOL_JSON, PROTOCOL_RECORDS
+from app.cache import get_default_cache
+from app.pipeline import generation_job, regeneration_job, STRATEGIES, STRATEGY_SINGLE
+from app.inference import get_backend
+from app.planner import AUTO_MODEL, resolve_models
+from app.jobs import get_job_manager, JobLimitError
+from app.library import get_library
+from app.singleflight import get_single_flight
+from app.store import ProjectStore
+from app.utils import build_tree_cached
+from app.viewer import get_page_cache, detect_language, split_pages, PAGE_LINES
+from app import tracing
+from core.creator import ZipBuilder, COMPRESSION_PRESETS
 
 # 1. Page Config
 st.set_page_config(page_title="AI Architect v5.2", page_icon="🏗️", layout="wide")
 
 # 2. CSS STYLING (Smart Scrolling & Original Design)
-st.markdown("""
-    <style>
-    @keyframes slideIn { from { transform: translateY(-20px); opacity: 0; } to { transform: translateY(0); opacity: 1; } }
-    
-    .hero-container {
-        background: linear-gradient(135deg, #4338ca 0%, #6366f1 100%);
-        padding: 2.5rem;
-        border-radius: 16px;
-        color: white;
-        text-align: center;
-        margin-bottom: 2rem;
-        box-shadow: 0 10px 30px rgba(67, 56, 202, 0.3);
-        animation: slideIn 0.8s ease-out;
-    }
-    .hero-title { font-size: 3.2rem; font-weight: 800; margin: 0; color: #ffffff; letter-spacing: -1px; }
-    .hero-subtitle { font-size: 1.2rem; color: #e0e7ff; margin-top: 10px; font-weight: 400; }
-
-    .feature-card {
-        background: white; padding: 1.5rem; border-radius: 12px; border: 1px solid #e5e7eb;
-        text-align: center; transition: all 0.3s ease; height: 100%; box-shadow: 0 4px 6px rgba(0,0,0,0.05);
-    }
-    .feature-card:hover { transform: translateY(-5px); border-color: #6366f1; box-shadow: 0 15px 30px rgba(99, 102, 241, 0.15); }
-    .feature-icon { font-size: 2.5rem; margin-bottom: 15px; }
-    .feature-title { font-weight: 700; font-size: 1.1rem; color: #111827; }
-    .feature-desc { color: #6b7280; font-size: 0.9rem; margin-top: 5px; line-height: 1.5; }
-
-    button[kind="primary"] {
-        background: linear-gradient(135deg, #4f46e5 0%, #7c3aed 100%) !important;
-        border: none !important; color: white !important; font-weight: 600 !important;
-        padding: 0.6rem 1.4rem; border-radius: 8px; transition: transform 0.2s ease !important;
-    }
-    button[kind="primary"]:hover { transform: scale(1.02); box-shadow: 0 5px 15px rgba(79, 70, 229, 0.4); }
-    
-    .footer {
-        position: fixed; left: 0; bottom: 0; width: 100%;
-        background: #ffffff; color: #9ca3af;
-        text-align: center; padding: 12px;
-        font-size: 0.8rem; border-top: 1px solid #f3f4f6; z-index: 100;
-    }
-
-    /* --- SMART SCROLLING CSS --- */
-    
-    /* 1. Force Scrollbars to appear ONLY when needed (Auto) */
-    div[data-testid="stVerticalBlockBorderWrapper"] > div > div {
-        overflow: auto !important; 
-    }
-
-    /* 2. Prevent text from wrapping (Forces Horizontal Scroll if text is long) */
-    .stTreeSelect div {
-        white-space: nowrap !important;
-        width: max-content; /* Ensure container grows to fit the widest text */
-    }
-    </style>
-""", unsafe_allow_html=True)
-
-# --- RECURSIVE TREE CONVERTER ---
-def convert_to_tree(file_data_keys):
+@st.cache_resource
+def load_css():
     """
-    Converts a list of paths ['src/utils/helper.py'] 
-    into nested dictionary format for streamlit-tree-select.
+    Reads assets/style.css once per process. Streamlit drops elements that a run
+    does not emit, so the <style> tag itself is still sent on every run.
     """
-    tree_nodes = []
-    for path in file_data_keys:
-        parts = path.split('/')
-        current_level = tree_nodes
-        current_full_path = ""
-        for i, part in enumerate(parts):
-            current_full_path = f"{current_full_path}/{part}" if current_full_path else part
-            existing_node = next((node for node in current_level if node['label'] == part), None)
-            if existing_node:
-                if 'children' in existing_node:
-                    current_level = existing_node['children']
-            else:
-                is_file = (i == len(parts) - 1)
-                new_node = {"label": part, "value": current_full_path, "showCheckbox": True}
-                if not is_file:
-                    new_node["children"] = []
-                    current_level.append(new_node)
-                    current_level = new_node["children"]
-                else:
-                    current_level.append(new_node)
-    return tree_nodes
+    with open(os.path.join(os.path.dirname(__file__), "assets", "style.css"), encoding="utf-8") as handle:
+        return f"<style>\n{handle.read()}</style>"
+
+st.html(load_css())
+
+def get_api_key():
+    """
+    The session's own token (Settings), else the deployment's HF_TOKEN secret.
+    """
+    api_key = st.session_state.get("user_hf_token", None)
+    if not api_key:
+        try:
+            api_key = st.secrets.get("HF_TOKEN")
+        except FileNotFoundError:  # No secrets.toml in this deployment
+            api_key = None
+    return api_key
+
+def open_blueprint(files, user_prompt):
+    """
+    Makes `files` the Builder's current project, with every file selected.
+    """
+    # Deduplicated, compressed-at-rest copy instead of a raw dict per session
+    store = ProjectStore(files, compress=True)
+    store.select_all()
+    st.session_state.file_data = store
+    st.session_state.project_prompt = user_prompt
+    st.session_state.tree_key += 1
+
+def load_from_library(match):
+    files = get_library().get(match.id)
+    if files:
+        open_blueprint(files, match.prompt)
+        st.toast("Loaded from the blueprint library ⚡", icon="📚")
+
+@st.fragment(run_every=1)
+def show_job_progress():
+    """
+    Polls the session's background generation job without rerunning the whole page.
+    """
+    manager = get_job_manager()
+    job = manager.get(st.session_state.job_id)
+    if job is None:
+        st.session_state.job_id = None
+        st.rerun()
+
+    if job.active:
+        with st.status(st.session_state.job_label, expanded=True):
+            st.write(job.message)
+            if job.outputs:
+                # Finished files can be opened while the rest is still streaming in
+                received = list(job.outputs)
+                current = st.session_state.get("preview_path")
+                preview = st.selectbox(
+                    f"📄 {len(received)} files received",
+                    received,
+                    index=received.index(current) if current in received else len(received) - 1
+                )
+                st.session_state.preview_path = preview
+                pages, total_lines = split_pages(job.outputs[preview])
+                st.code(pages[0], language=detect_language(preview), line_numbers=True)
+                if len(pages) > 1:
+                    st.caption(f"First {PAGE_LINES} of {total_lines} lines. The full file opens in the viewer when generation finishes.")
+            elif job.items:
+                st.caption(f"📄 {len(job.items)} files received")
+                st.code("\n".join(job.items[-12:]), language="text")
+            if st.button("✖ Cancel", key=f"cancel_{job.id}"):
+                manager.cancel(job.id)
+        return
+
+    # Finished: hand the job to the full page run
+    st.session_state.job_id = None
+    st.session_state.finished_job = job
+    st.rerun()
+
+@st.fragment
+def show_code_viewer():
+    """
+    Renders one page of the first checked file. Page flips only rerun this fragment.
+    """
+    store = st.session_state.file_data
+    target = st.session_state.viewer_target
+    if target is None:
+        st.info("👈 Select a file to view code")
+        return
+    if target not in store:
+        st.info(f"📂 Folder: {target}")
+        return
+
+    # Split and language detection are cached per (path, content hash)
+    code = get_page_cache().get_pages(target, store.digest(target), lambda: store[target])
+    if code.total_lines == 0 or not any(page.strip() for page in code.pages):
+        st.info(f"📄 `{target}` is empty")
+        return
+
+    st.markdown(f"**📄 {target}**")
+    page = min(st.session_state.viewer_page, len(code.pages) - 1)
+    if len(code.pages) > 1:
+        def flip_page(step):
+            st.session_state.viewer_page = page + step
+
+        p1, p2, p3 = st.columns([1, 2, 1])
+        with p1:
+            st.button("◀", key="viewer_prev", on_click=flip_page, args=(-1,), disabled=page == 0, use_container_width=True)
+        with p3:
+            st.button("▶", key="viewer_next", on_click=flip_page, args=(1,), disabled=page == len(code.pages) - 1, use_container_width=True)
+        with p2:
+            first = page * PAGE_LINES + 1
+            st.caption(f"Lines {first}-{min(first + PAGE_LINES - 1, code.total_lines)} of {code.total_lines}")
+    st.code(code.pages[page], language=code.language, line_numbers=True)
 
 def main():
     if "complexity" not in st.session_state: st.session_state.complexity = "Working Code"
+    if "strategy" not in st.session_state: st.session_state.strategy = STRATEGY_SINGLE
+    if "protocol" not in st.session_state: st.session_state.protocol = PROTOCOL_JSON
+    if "session_id" not in st.session_state: st.session_state.session_id = uuid.uuid4().hex
+    if "job_id" not in st.session_state: st.session_state.job_id = None
+    if "job_kind" not in st.session_state: st.session_state.job_kind = "generate"
+    if "debug_panel" not in st.session_state: st.session_state.debug_panel = tracing.is_enabled()
+    if "export_compression" not in st.session_state: st.session_state.export_compression = "Balanced (Deflate 6)"
+    if "zip_builder" not in st.session_state: st.session_state.zip_builder = ZipBuilder()
     if "tree_key" not in st.session_state: st.session_state.tree_key = 0
-    if "checked_files" not in st.session_state: st.session_state.checked_files = []
     if "nav_index" not in st.session_state: st.session_state.nav_index = 0
     if "menu_key" not in st.session_state: st.session_state.menu_key = 0
+    if "viewer_target" not in st.session_state: st.session_state.viewer_target = None
+    if "viewer_page" not in st.session_state: st.session_state.viewer_page = 0
+    if "share_library" not in st.session_state: st.session_state.share_library = False
+
+    # Build and warm the inference clients in the background as soon as a token is known
+    api_key = get_api_key()
+    if api_key and st.session_state.get("prewarmed_token") != api_key:
+        st.session_state.prewarmed_token = api_key
+        for model_id in resolve_models(st.session_state.get("selected_model", DEFAULT_MODEL)):
+            get_backend().prewarm(api_key, model_id)
 
     with st.sidebar:
         st.image("https://cdn-icons-png.flaticon.com/512/3767/3767084.png", width=55)
@@ -154,8 +215,10 @@ def main():
 
     # --- 2. BUILDER PAGE ---
     elif selected == "Builder":
+        from streamlit_tree_select import tree_select  # Only the Builder needs the tree component
+
         st.title("Project Studio")
-        if "file_data" not in st.session_state: st.session_state.file_data = {}
+        if "file_data" not in st.session_state: st.session_state.file_data = ProjectStore()
 
         col1, col2 = st.columns([1, 1.5], gap="large")
 
@@ -168,61 +231,132 @@ def main():
             
             user_input = st.text_area("Describe your project:", placeholder="E.g. A Data Analysis pipeline using Pandas...", height=180)
             
-            if st.button("✨ Generate Blueprint", type="primary", use_container_width=True):
+            if st.button("✨ Generate Blueprint", type="primary", use_container_width=True, disabled=bool(st.session_state.job_id)):
                 if user_input:
                     status_label = "Processing..."
                     if mode == "Structure Only": status_label = "Architecting structure..."
                     elif mode == "Simple Code": status_label = "Drafting code skeletons..."
                     else: status_label = "Writing full boilerplate code (~45s)..."
 
-                    with st.status(status_label, expanded=True) as status:
-                        st.write("Connecting to AI Engine...")
-                        api_key = st.session_state.get("user_hf_token", None)
-                        if not api_key and "HF_TOKEN" in st.secrets:
-                            api_key = st.secrets["HF_TOKEN"]
-                            
-                        raw = get_ai_response(user_input, api_key=api_key, complexity=mode)
-                        
-                        st.write("Parsing blueprint...")
-                        parsed = parse_ai_response(raw)
-                        
-                        if parsed:
-                            st.session_state.file_data = parsed
-                            st.session_state.checked_files = list(parsed.keys())
-                            st.session_state.tree_key += 1 
-                            status.update(label="Blueprint Ready", state="complete", expanded=False)
-                            st.toast("Project generated successfully!", icon="✅")
-                        else:
-                            status.update(label="Generation Failed", state="error")
-                            st.error("AI Error. Please try again.")
-                            with st.expander("View Debug Info"):
-                                st.code(raw, language="json")
+                    api_key = get_api_key()
+
+                    # Runs in the background job pool; this script thread stays free
+                    try:
+                        st.session_state.job_id = get_job_manager().submit(
+                            st.session_state.session_id,
+                            generation_job,
+                            user_input,
+                            api_key=api_key,
+                            complexity=mode,
+                            model=st.session_state.get("selected_model", DEFAULT_MODEL),
+                            strategy=st.session_state.strategy,
+                            protocol=st.session_state.protocol,
+                            trace=st.session_state.debug_panel,
+                            cache=get_default_cache(),
+                            single_flight=get_single_flight(),
+                            # Only shared with other users when this session opted in (Settings)
+                            library=get_library() if st.session_state.share_library else None
+                        )
+                        st.session_state.job_label = status_label
+                        st.session_state.job_kind = "generate"
+                        st.session_state.project_prompt = user_input
+                        st.rerun()
+                    except JobLimitError as e:
+                        st.warning(str(e))
+
+            # A near-identical blueprint was generated before: offer it instead of a new inference
+            library = get_library()
+            if user_input and not st.session_state.job_id:
+                close = library.find_similar(user_input, mode)
+                if close is not None:
+                    st.info(f"📚 A near-identical blueprint ({close.file_count} files, {close.score:.0%} match) is already in the library.")
+                    if st.button("⚡ Use it instantly", use_container_width=True, key=f"reuse_{close.id}"):
+                        load_from_library(close)
+
+            with st.expander("📚 Blueprint Library"):
+                query = st.text_input("Search saved blueprints", placeholder="E.g. fastapi postgres auth")
+                matches = library.search(query, limit=8) if query else library.recent(8)
+                if not matches:
+                    st.caption("No matches." if query else "Blueprints shared by users (see Settings) appear here.")
+                for match in matches:
+                    l1, l2 = st.columns([4, 1])
+                    with l1:
+                        st.markdown(f"**{match.prompt[:90]}**")
+                        details = f"{match.complexity} · {match.file_count} files · {match.model}"
+                        if match.score is not None:
+                            details += f" · {match.score:.0%} match"
+                        st.caption(details)
+                    with l2:
+                        if st.button("Load", key=f"library_{match.id}", use_container_width=True):
+                            load_from_library(match)
+
+            if st.session_state.job_id:
+                show_job_progress()
+
+            finished = st.session_state.pop("finished_job", None)
+            if finished is not None:
+                st.session_state.last_trace = finished.trace
+                if st.session_state.job_kind == "regenerate" and finished.status == "done" and finished.result[0]:
+                    new_files, removed, outcome, _ = finished.result
+                    store = st.session_state.file_data
+                    old_paths = set(store)
+                    # Only the regenerated part changes; unchanged ZIP entries stay cached
+                    store.remove(removed)
+                    store.update(new_files)
+                    store.select_paths(store.selected_paths() + list(new_files))
+                    if set(store) != old_paths:
+                        st.session_state.tree_key += 1
+                    if outcome["complete"]:
+                        st.toast(f"Regenerated {len(new_files)} file(s)", icon="🔁")
+                    else:
+                        st.warning(f"Regeneration was cut off. Updated the {len(new_files)} file(s) that came "
+                                   "through; no files were removed.")
+                elif finished.status == "done" and finished.result[0]:
+                    parsed, outcome, raw = finished.result
+                    open_blueprint(parsed, st.session_state.project_prompt)
+                    if raw is None:
+                        st.toast("Loaded identical blueprint from cache ⚡", icon="✅")
+                    elif not outcome["complete"]:
+                        reason = outcome["error"] or "the response was cut off"
+                        st.warning(f"Generation did not finish ({reason}). Showing the {len(parsed)} files that did; "
+                                   "this result was not cached.")
+                    else:
+                        st.toast("Project generated successfully!", icon="✅")
+                elif finished.status == "cancelled":
+                    st.info("Generation cancelled.")
+                else:
+                    st.error("AI Error. Please try again.")
+                    with st.expander("View Debug Info"):
+                        st.code(finished.error or finished.result[-1], language="json")
+
+            if st.session_state.debug_panel:
+                with st.expander("⏱️ Debug: Timing Breakdown"):
+                    # Only this session's own spans (collected by its last job)
+                    if st.session_state.get("last_trace"):
+                        st.caption("Last generation")
+                        st.dataframe(st.session_state.last_trace, use_container_width=True, hide_index=True)
+                    else:
+                        st.caption("Timings appear here after your next generation.")
 
         with col2:
             st.subheader("2. Preview & Export")
             
             with st.container(border=True):
-                if st.session_state.file_data:
-                    file_keys = list(st.session_state.file_data.keys())
-                    tree_nodes = convert_to_tree(file_keys)
-                    
-                    all_vals = []
-                    def get_all_values(nodes):
-                        for node in nodes:
-                            all_vals.append(node["value"])
-                            if "children" in node: get_all_values(node["children"])
-                    get_all_values(tree_nodes)
+                store = st.session_state.file_data
+                if store:
+                    # Memoized on the file set: checkbox reruns reuse the same tree
+                    tree_nodes, all_vals = build_tree_cached(store)
                     
                     # Controls
                     c_ctrl1, c_ctrl2, c_ctrl3 = st.columns([1, 1, 1.5])
                     with c_ctrl1:
                         if st.button("Select All", use_container_width=True):
-                            st.session_state.checked_files = list(st.session_state.file_data.keys())
+                            store.select_all()
                             st.session_state.tree_key += 1
                             st.rerun()
                     with c_ctrl2:
                         if st.button("Clear All", use_container_width=True):
-                            st.session_state.checked_files = []
+                            store.clear_selection()
                             st.session_state.tree_key += 1
                             st.rerun()
                     with c_ctrl3:
@@ -246,45 +380,68 @@ def main():
                             selected_tree = tree_select(
                                 tree_nodes, 
                                 key=f"tree_{st.session_state.tree_key}", 
-                                checked=st.session_state.checked_files,
+                                checked=store.selected_paths(),
                                 expanded=expanded_items, 
                                 no_cascade=False
                             )
-                            if selected_tree["checked"] != st.session_state.checked_files:
-                                st.session_state.checked_files = selected_tree["checked"]
-                                st.rerun()
+                            # Selection is a set of file IDs; folders are ignored. The store is
+                            # updated in place, so the viewer and export below already see it
+                            # (no extra rerun per checkbox click).
+                            store.select_paths(selected_tree["checked"])
+                            target = selected_tree["checked"][0] if selected_tree["checked"] else None
+                            if target != st.session_state.viewer_target:
+                                st.session_state.viewer_target = target
+                                st.session_state.viewer_page = 0
                     
                     with c2:
                         st.caption("📝 Code Viewer")
                         # 2. FIXED HEIGHT: Match the tree height
                         with st.container(height=500, border=True):
-                            if selected_tree['checked']:
-                                target = selected_tree['checked'][0]
-                                if target in st.session_state.file_data:
-                                    content = st.session_state.file_data[target]
-                                    if not content.strip():
-                                        st.info(f"📄 `{target}` is empty")
-                                    else:
-                                        lang = "python" if target.endswith(".py") else "text"
-                                        st.markdown(f"**📄 {target}**")
-                                        st.code(content, language=lang, line_numbers=True)
-                                else:
-                                    st.info(f"📂 Folder: {target}")
-                            else:
-                                st.info("👈 Select a file to view code")
+                            show_code_viewer()
+
+                    with st.expander("🔁 Regenerate a file or folder"):
+                        current = st.session_state.viewer_target
+                        regen_target = st.selectbox(
+                            "Target", all_vals,
+                            index=all_vals.index(current) if current in all_vals else 0
+                        )
+                        regen_instructions = st.text_input("What should change? (optional)", placeholder="E.g. Use async SQLAlchemy")
+                        if st.button("Regenerate", use_container_width=True, disabled=bool(st.session_state.job_id)):
+                            api_key = get_api_key()
+                            try:
+                                st.session_state.job_id = get_job_manager().submit(
+                                    st.session_state.session_id,
+                                    regeneration_job,
+                                    st.session_state.get("project_prompt", ""),
+                                    regen_target,
+                                    dict(store),
+                                    api_key=api_key,
+                                    complexity=st.session_state.complexity,
+                                    model=st.session_state.get("selected_model", DEFAULT_MODEL),
+                                    instructions=regen_instructions or None,
+                                    trace=st.session_state.debug_panel
+                                )
+                                st.session_state.job_label = f"Regenerating {regen_target}..."
+                                st.session_state.job_kind = "regenerate"
+                                st.rerun()
+                            except JobLimitError as e:
+                                st.warning(str(e))
                 else:
                     st.info("Your project structure will appear here.")
 
-        if st.session_state.file_data:
+        store = st.session_state.file_data
+        if store:
             st.divider()
-            files_to_zip = {f: st.session_state.file_data[f] for f in st.session_state.checked_files if f in st.session_state.file_data}
-            count = len(files_to_zip)
+            count = len(store.selected)
+            method, level = COMPRESSION_PRESETS[st.session_state.export_compression]
+            zip_builder = st.session_state.zip_builder
             b1, b2, b3 = st.columns([1, 2, 1])
             with b2:
                 btn_text = f"📥 Download ZIP ({count} Files)" if count > 0 else "⚠️ Select files to download"
                 st.download_button(
                     label=btn_text,
-                    data=create_in_memory_zip(files_to_zip) if count > 0 else b"empty",
+                    # Deferred: the archive is only built (or fetched from cache) when clicked
+                    data=(lambda: zip_builder.build(store.selected_files(), method, level)) if count > 0 else b"empty",
                     file_name="AI_Project.zip",
                     mime="application/zip",
                     type="primary",
@@ -307,27 +464,70 @@ def main():
             elif complexity_choice == "Simple Code": st.warning("🚀 **Simple Code:** Classes & TODOs.")
             else: st.success("🧠 **Working Code:** Full Logic & Imports.")
 
+            strategy_choice = st.radio(
+                "Generation Strategy",
+                options=STRATEGIES,
+                index=STRATEGIES.index(st.session_state.strategy),
+                horizontal=True
+            )
+            if strategy_choice != STRATEGY_SINGLE:
+                st.caption("Builds the tree first, then writes every file concurrently. Best for large projects.")
+
+            protocol_choice = st.radio(
+                "Output Protocol",
+                options=PROTOCOLS,
+                index=PROTOCOLS.index(st.session_state.protocol),
+                horizontal=True
+            )
+            if protocol_choice == PROTOCOL_RECORDS:
+                st.caption("One record per file and line. A cut-off response still gives every finished file.")
+
         with st.container(border=True):
             st.subheader("AI Engine")
             model_mode = st.radio("Provider:", ["Presets", "Custom ID"], horizontal=True)
             
             if model_mode == "Presets":
-                model_choice = st.selectbox("Select Model:", ["Qwen/Qwen2.5-Coder-32B-Instruct", "google/gemma-2-9b-it"])
-                if "Qwen" in model_choice:
+                model_choice = st.selectbox("Select Model:", [AUTO_MODEL, "Qwen/Qwen2.5-Coder-32B-Instruct", "google/gemma-2-9b-it"],
+                                            format_func=lambda m: "Auto (Planner)" if m == AUTO_MODEL else m)
+                if model_choice == AUTO_MODEL:
+                    st.info("🧭 **Auto:** Sizes the token budget from your prompt, sends small and structure-only jobs to Gemma and heavy ones to Qwen.")
+                elif "Qwen" in model_choice:
                     st.info("🤖 **Qwen 2.5 (32B):** Best for Python/Java logic. Slower.")
                 else:
                     st.success("🏎️ **Gemma 2 (9B):** Best for speed and simple scripts.")
             else:
                 model_choice = st.text_input("HuggingFace Model ID:", st.session_state.get("selected_model", "Qwen/Qwen2.5-Coder-32B-Instruct"))
 
+        with st.container(border=True):
+            st.subheader("Export")
+            compression_options = list(COMPRESSION_PRESETS)
+            compression_choice = st.selectbox(
+                "ZIP Compression",
+                options=compression_options,
+                index=compression_options.index(st.session_state.export_compression)
+            )
+
         with st.container(border=True):
             st.subheader("API Access")
             user_token = st.text_input("Hugging Face Token (Optional)", type="password")
+            share_library = st.toggle("Share my blueprints in the library", value=st.session_state.share_library,
+                                      help="Adds your prompts and generated blueprints to the Blueprint Library, where every user can search and load them.")
+            debug_panel = st.toggle("Debug Panel (timings)", value=st.session_state.debug_panel, help="Traces network and parsing timings of your own generations and shows them on the Builder page.")
+            warm_up = st.checkbox("Warm up model after saving", value=True, help="Sends a tiny background request so the model is loaded before you generate.")
 
         if st.button("💾 Save Settings", type="primary"):
             if user_token: st.session_state.user_hf_token = user_token
             st.session_state.selected_model = model_choice
             st.session_state.complexity = complexity_choice
+            st.session_state.strategy = strategy_choice
+            st.session_state.protocol = protocol_choice
+            st.session_state.export_compression = compression_choice
+            st.session_state.debug_panel = debug_panel
+            st.session_state.share_library = share_library
+            api_key = get_api_key()
+            if warm_up and api_key:
+                for model_id in resolve_models(model_choice):
+                    get_backend().warm_up(api_key, model_id)
             st.toast("Settings Saved!", icon="💾")
 
     # --- 4. FAQ PAGE ---
@@ -339,7 +539,11 @@ def main():
             st.write("The AI Architect supports **all major languages**. You can ask for Python (Django/Flask), JavaScript (React/Node), Java, C++, or even Rust projects. Just specify the language in your description!")
 
         with st.expander("🔑 Is my data private?"):
-            st.write("Yes. Your prompts are sent to the Hugging Face Inference API for processing and are not stored by this application.")
+            st.write("Your prompts are sent to the Hugging Face Inference API for processing. "
+                     "To answer repeated requests instantly, this application keeps each generated blueprint and its prompt "
+                     "in a server-side cache for 7 days; it is only used to answer the exact same request and is never listed. "
+                     "Your prompts and blueprints are added to the shared Blueprint Library, where every user can search and load them, "
+                     "only if you turn on **Share my blueprints in the library** in Settings.")
 
         with st.expander("💼 Can I use the generated code commercially?"):
             st.write("Yes! The code generated is boilerplate (standard code). You are free to use it, modify it, and sell projects built with it.")
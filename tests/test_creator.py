@@ -0,0 +1,81 @@
+import io
+import zipfile
+
+import pytest
+
+from core.creator import (HEADER_TEMPLATE, ZipBuilder, ZipEntryCache, compress_entry, create_in_memory_zip,
+                          get_entry_cache, iter_zip_entries, write_zip)
+
+FILES = {
+    "proj/app.py": "print('hello')\n" * 50,
+    "proj/utils/helper.py": "def add(a, b):\n    return a + b\n",
+    "proj/données/lisez-moi.md": "ünïcödé ✓",
+    "/proj/empty.txt": "",
+    "proj/number.txt": 42,
+}
+
+
+def expected_bytes(path, content):
+    clean = path.lstrip("/")
+    return clean, (HEADER_TEMPLATE.format(path=clean) + str(content)).encode("utf-8")
+
+
+@pytest.mark.parametrize("method, level", [(zipfile.ZIP_DEFLATED, 6), (zipfile.ZIP_DEFLATED, None), (zipfile.ZIP_STORED, None)])
+def test_archive_round_trips_through_zipfile(method, level):
+    archive = create_in_memory_zip(FILES, method, level)
+    with zipfile.ZipFile(io.BytesIO(archive)) as zf:
+        assert zf.testzip() is None
+        assert zf.namelist() == [expected_bytes(path, content)[0] for path, content in FILES.items()]
+        for path, content in FILES.items():
+            name, data = expected_bytes(path, content)
+            info = zf.getinfo(name)
+            assert info.compress_type == method
+            assert zf.read(name) == data
+
+
+def test_write_zip_streams_the_same_archive():
+    handle = io.BytesIO()
+    written = write_zip(FILES, handle)
+    assert written == len(handle.getvalue())
+    with zipfile.ZipFile(handle) as zf:
+        assert zf.testzip() is None
+        assert len(zf.namelist()) == len(FILES)
+
+
+def test_empty_archive_is_valid():
+    with zipfile.ZipFile(io.BytesIO(create_in_memory_zip({}))) as zf:
+        assert zf.namelist() == []
+
+
+def test_entries_are_position_independent():
+    entries = [compress_entry(path, content) for path, content in FILES.items()]
+    reordered = b"".join(iter_zip_entries(reversed(entries), timestamp=0))
+    with zipfile.ZipFile(io.BytesIO(reordered)) as zf:
+        assert zf.testzip() is None
+        assert zf.namelist()[0] == entries[-1].name
+
+
+def test_entry_cache_reuses_compressed_entries():
+    cache = ZipEntryCache()
+    first = compress_entry("a.py", "x = 1\n", entry_cache=cache)
+    assert compress_entry("a.py", "x = 1\n", entry_cache=cache) is first
+    assert compress_entry("a.py", "x = 2\n", entry_cache=cache) is not first
+    assert compress_entry("a.py", "x = 1\n", compresslevel=9, entry_cache=cache) is not first
+
+
+def test_entry_cache_evicts_to_its_budget():
+    cache = ZipEntryCache(max_bytes=1)
+    compress_entry("a.py", "a" * 1000, method=zipfile.ZIP_STORED, entry_cache=cache)
+    compress_entry("b.py", "b" * 1000, method=zipfile.ZIP_STORED, entry_cache=cache)
+    assert len(cache._entries) == 1
+
+
+def test_builders_share_one_entry_cache_and_keep_one_archive():
+    first, second = ZipBuilder(), ZipBuilder()
+    assert first.entry_cache is second.entry_cache is get_entry_cache()
+
+    archive = first.build(FILES)
+    assert first.build(dict(FILES)) is archive
+    first.build({"proj/app.py": "changed"})
+    assert len(first._archives) == 1
+    assert first.build(FILES) == archive
@@ -0,0 +1,45 @@
+import pytest
+
+from app.library import BlueprintLibrary, minhash, similarity
+
+
+@pytest.fixture
+def library(tmp_path):
+    return BlueprintLibrary(str(tmp_path / "library.sqlite3"))
+
+
+def test_near_duplicate_prompt_is_found(library):
+    blueprint_id = library.add("A FastAPI service with JWT auth and Postgres", "Working Code", "m", {"app/main.py": "x"})
+    match = library.find_similar("a fastapi service with jwt auth and postgres", "Working Code")
+    assert match is not None and match.id == blueprint_id and match.score == 1.0
+    assert library.find_similar("A FastAPI service with JWT auth and Postgres", "Simple Code") is None
+    assert library.get(blueprint_id) == {"app/main.py": "x"}
+
+
+def test_unrelated_prompt_is_not_reused(library):
+    library.add("A FastAPI service with JWT auth and Postgres", "Working Code", "m", {"a.py": ""})
+    assert library.find_similar("A React dashboard for sales charts", "Working Code") is None
+
+
+def test_prompts_without_shingles_never_match(library):
+    assert minhash("Create a project please") is None
+    assert similarity(None, None) == 0.0
+    library.add("Build me an app", "Working Code", "m", {"a.py": ""})
+    library.add("make it", "Working Code", "m", {"b.py": ""})
+    assert library.find_similar("make it", "Working Code") is None
+    assert library.find_similar("Create a project please", "Working Code") is None
+    assert library.search("make it") == []
+
+
+def test_search_ranks_lexical_and_similar_matches(library):
+    library.add("Flask todo app with SQLite", "Working Code", "m", {"todo/app.py": ""})
+    library.add("Django blog with comments", "Working Code", "m", {"blog/models.py": ""})
+    matches = library.search("flask sqlite")
+    assert [match.prompt for match in matches] == ["Flask todo app with SQLite"]
+
+
+def test_same_key_replaces_entry(library):
+    library.add("Flask todo app", "Working Code", "m", {"a.py": "1"}, key="k")
+    library.add("Flask todo app", "Working Code", "m", {"a.py": "2"}, key="k")
+    assert len(library) == 1
+    assert library.get(library.recent(1)[0].id) == {"a.py": "2"}
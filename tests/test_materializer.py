@@ -0,0 +1,119 @@
+import json
+import os
+
+import pytest
+
+from core import materializer
+from core.creator import HEADER_TEMPLATE
+from core.materializer import MANIFEST_NAME, UnsafePathError, check_path, load_manifest, materialize
+
+FILES = {
+    "proj/app.py": "print('hello')\n",
+    "proj/utils/helper.py": "def add(a, b):\n    return a + b\n",
+    "proj/utils/deep/more.py": "x = 1\n",
+    "proj/README.md": "# Proj\n",
+}
+
+
+def listing(root):
+    return sorted(
+        os.path.relpath(os.path.join(directory, name), root).replace(os.sep, "/")
+        for directory, _, names in os.walk(root)
+        for name in names
+    )
+
+
+@pytest.mark.parametrize("path", [
+    "../evil.py", "proj/../../evil.py", "proj/..", "..\\evil.py",
+    "/etc/passwd", "\\etc\\passwd", "C:/Windows/evil.py", "c:evil.py",
+    "", "   ", ".", "./",
+])
+def test_check_path_rejects_unsafe_paths(path):
+    with pytest.raises(UnsafePathError):
+        check_path(path)
+
+
+@pytest.mark.parametrize("path, expected", [
+    ("proj/app.py", "proj/app.py"),
+    ("proj\\utils\\helper.py", "proj/utils/helper.py"),
+    ("proj/./app.py", "proj/app.py"),
+    ("proj//app.py", "proj/app.py"),
+    (" proj/app.py ", "proj/app.py"),
+    ("proj/..hidden/x.py", "proj/..hidden/x.py"),
+])
+def test_check_path_normalizes_safe_paths(path, expected):
+    assert check_path(path) == expected
+
+
+def test_unsafe_path_writes_nothing(tmp_path):
+    with pytest.raises(UnsafePathError):
+        materialize({"proj/ok.py": "1", "../escape.py": "2"}, tmp_path / "out")
+    assert not (tmp_path / "out").exists()
+    assert not (tmp_path / "escape.py").exists()
+
+
+def test_files_match_the_zip_bytes(tmp_path):
+    stats = materialize(FILES, tmp_path)
+    assert stats == {"written": 4, "skipped": 0, "removed": 0, "dirs": 1}  # proj/utils/deep creates its parents
+    assert listing(tmp_path) == sorted(FILES)
+    for path, content in FILES.items():
+        assert (tmp_path / path).read_text(encoding="utf-8") == HEADER_TEMPLATE.format(path=path) + content
+
+    materialize({"raw.txt": "plain"}, tmp_path, watermark=False)
+    assert (tmp_path / "raw.txt").read_text(encoding="utf-8") == "plain"
+
+
+def test_failed_write_keeps_the_old_file_and_no_temp_file(tmp_path, monkeypatch):
+    materialize({"a.py": "old"}, tmp_path, watermark=False)
+
+    def fail(src, dst):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(materializer.os, "replace", fail)
+    with pytest.raises(OSError):
+        materialize({"a.py": "new"}, tmp_path, watermark=False)
+    assert (tmp_path / "a.py").read_text(encoding="utf-8") == "old"
+    assert listing(tmp_path) == ["a.py"]
+
+
+def test_incremental_run_skips_unchanged_files(tmp_path):
+    first = materialize(FILES, tmp_path, incremental=True)
+    assert (first["written"], first["skipped"]) == (4, 0)
+    assert set(load_manifest(tmp_path)) == set(FILES)
+
+    changed = dict(FILES, **{"proj/app.py": "print('changed')\n"})
+    second = materialize(changed, tmp_path, incremental=True)
+    assert (second["written"], second["skipped"]) == (1, 3)
+    assert "changed" in (tmp_path / "proj/app.py").read_text(encoding="utf-8")
+
+    # A file deleted on disk is written again even though the manifest still lists it
+    (tmp_path / "proj/README.md").unlink()
+    third = materialize(changed, tmp_path, incremental=True)
+    assert (third["written"], third["skipped"]) == (1, 3)
+    assert (tmp_path / "proj/README.md").is_file()
+
+
+def test_prune_removes_only_files_from_the_previous_manifest(tmp_path):
+    materialize(FILES, tmp_path, incremental=True)
+    (tmp_path / "proj/notes.txt").write_text("mine", encoding="utf-8")
+
+    kept = {path: content for path, content in FILES.items() if "utils" not in path}
+    stats = materialize(kept, tmp_path, incremental=True, prune=True)
+    assert stats["removed"] == 2
+    assert stats["skipped"] == 2
+    assert listing(tmp_path) == sorted([MANIFEST_NAME, "proj/README.md", "proj/app.py", "proj/notes.txt"])
+    with open(tmp_path / MANIFEST_NAME, encoding="utf-8") as handle:
+        assert set(json.load(handle)) == set(kept)
+
+
+def test_prune_refuses_unsafe_manifest_entries(tmp_path):
+    target = tmp_path / "out"
+    materialize({"a.py": "1"}, target, incremental=True)
+    (tmp_path / "victim.py").write_text("keep", encoding="utf-8")
+    manifest = load_manifest(target)
+    manifest["../victim.py"] = "0" * 32
+    (target / MANIFEST_NAME).write_text(json.dumps(manifest), encoding="utf-8")
+
+    with pytest.raises(UnsafePathError):
+        materialize({"a.py": "1"}, target, prune=True)
+    assert (tmp_path / "victim.py").read_text(encoding="utf-8") == "keep"
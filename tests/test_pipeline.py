@@ -0,0 +1,118 @@
+import threading
+
+import pytest
+
+from app import pipeline
+from app.api_handler import INVALID_API_KEY, InferenceError, PROTOCOL_JSON, PROTOCOL_RECORDS, _error_message
+from app.cache import ResponseCache
+from app.library import BlueprintLibrary
+from app.singleflight import SingleFlight
+
+
+def fake_stream(chunks, error=None):
+    def stream(user_prompt, **kwargs):
+        yield from chunks
+        if error is not None:
+            raise InferenceError(error)
+    return stream
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ResponseCache(str(tmp_path / "cache.sqlite3"))
+
+
+@pytest.fixture
+def library(tmp_path):
+    return BlueprintLibrary(str(tmp_path / "library.sqlite3"))
+
+
+def test_stream_error_is_not_spliced_into_files(monkeypatch):
+    monkeypatch.setattr(pipeline, "stream_ai_response",
+                        fake_stream(['{"proj": {"a.py": "print(1)", "b.py": "import os\\n'], "Connection Error: boom"))
+    outcome = {}
+    files, _raw = pipeline.generate_blueprint("p", api_key="k", outcome=outcome)
+    assert files == {"proj/a.py": "print(1)"}
+    assert outcome == {"complete": False, "error": "Connection Error: boom"}
+
+
+def test_stream_error_before_output(monkeypatch):
+    monkeypatch.setattr(pipeline, "stream_ai_response", fake_stream([], "No API Key provided."))
+    files, raw = pipeline.generate_blueprint("p", api_key="k")
+    assert files is None
+    assert pipeline.extract_error(raw) == "No API Key provided."
+
+
+@pytest.mark.parametrize("protocol, chunks, error, complete", [
+    (PROTOCOL_JSON, ['{"proj": {"a.py": "x"}}'], None, True),
+    (PROTOCOL_JSON, ['{"proj": {"a.py": "x", "b.py": "y'], None, False),
+    (PROTOCOL_JSON, ['{"proj": {"a.py": "x"}}'], "Connection Error: late", False),
+    (PROTOCOL_RECORDS, ['{"path": "p/a.py", "content": "x"}\n{"done": true}\n'], None, True),
+    (PROTOCOL_RECORDS, ['{"path": "p/a.py", "content": "x"}\n'], None, False),
+])
+def test_only_complete_blueprints_are_cached(monkeypatch, cache, library, protocol, chunks, error, complete):
+    monkeypatch.setattr(pipeline, "stream_ai_response", fake_stream(chunks, error))
+    outcome = {}
+    files, raw = pipeline.generate_blueprint("p", api_key="k", cache=cache, library=library, protocol=protocol,
+                                             outcome=outcome)
+    assert files and raw is not None
+    assert outcome["complete"] is complete
+    assert (len(library) == 1) is complete
+
+    # A complete blueprint is served from the cache next time; an incomplete one is generated again
+    monkeypatch.setattr(pipeline, "stream_ai_response", fake_stream(['{"proj": {"new.py": ""}}']))
+    _files, raw = pipeline.generate_blueprint("p", api_key="k", cache=cache, protocol=protocol)
+    assert (raw is None) is complete
+
+
+def test_truncated_folder_regeneration_removes_nothing(monkeypatch):
+    files = {"app/a.py": "1", "app/b.py": "2", "app/c.py": "3", "main.py": "4"}
+    monkeypatch.setattr(pipeline, "get_ai_response", lambda *a, **kw: '{"a.py": "new", "b.py": "new", "c.py": "ne')
+    outcome = {}
+    new_files, removed, _raw = pipeline.regenerate_paths("p", "app", files, api_key="k", outcome=outcome)
+    assert new_files == {"app/a.py": "new", "app/b.py": "new"}
+    assert removed == []
+    assert outcome == {"complete": False}
+
+    monkeypatch.setattr(pipeline, "get_ai_response", lambda *a, **kw: '{"a.py": "new"}')
+    new_files, removed, _raw = pipeline.regenerate_paths("p", "app", files, api_key="k", outcome=outcome)
+    assert new_files == {"app/a.py": "new"}
+    assert removed == ["app/b.py", "app/c.py"]
+    assert outcome == {"complete": True}
+
+
+def test_rejected_api_key_is_not_shared_with_followers(monkeypatch):
+    started, joined = threading.Event(), threading.Event()
+    keys = []
+
+    def stream(user_prompt, api_key=None, **kwargs):
+        keys.append(api_key)
+        if api_key == "bad":
+            started.set()
+            joined.wait(5)
+            raise InferenceError(_error_message("401 Client Error: Unauthorized", "m"))
+        yield '{"proj": {"a.py": "print(1)"}}'
+
+    monkeypatch.setattr(pipeline, "stream_ai_response", stream)
+    flight = SingleFlight()
+    leader = {}
+
+    def lead():
+        outcome = {}
+        leader["files"], _raw = pipeline.generate_blueprint("p", api_key="bad", single_flight=flight, outcome=outcome)
+        leader["outcome"] = outcome
+
+    thread = threading.Thread(target=lead)
+    thread.start()
+    assert started.wait(5)
+    outcome = {}
+    files, _raw = pipeline.generate_blueprint("p", api_key="good", single_flight=flight, on_wait=joined.set,
+                                              outcome=outcome)
+    thread.join(5)
+
+    # The follower ran its own call with its own key instead of sharing the 401
+    assert keys == ["bad", "good"]
+    assert files == {"proj/a.py": "print(1)"}
+    assert outcome == {"complete": True, "error": None}
+    assert leader["files"] is None
+    assert leader["outcome"] == {"complete": False, "error": INVALID_API_KEY}
@@ -0,0 +1,25 @@
+import threading
+import time
+
+from app.shared import process_singleton
+
+
+def test_factory_runs_once_across_threads():
+    calls = []
+
+    @process_singleton
+    def get_thing():
+        calls.append(1)
+        time.sleep(0.05)  # Widen the race window
+        return object()
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(get_thing())) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(calls) == 1
+    assert len({id(result) for result in results}) == 1
+    assert get_thing.__name__ == "get_thing"
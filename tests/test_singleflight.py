@@ -0,0 +1,138 @@
+import threading
+import time
+
+import pytest
+
+from app.jobs import JobCancelled
+from app.singleflight import SingleFlight, SingleFlightTimeout
+
+
+def start_leader(flight, key="k", result="result", exc=None):
+    """
+    Runs a leader in a thread that blocks until `release` is set. Returns (release, thread, outcome).
+    """
+    started, release = threading.Event(), threading.Event()
+    outcome = {}
+
+    def fn():
+        started.set()
+        release.wait(5)
+        if exc is not None:
+            raise exc
+        return result
+
+    def run():
+        try:
+            outcome["value"] = flight.do(key, fn)
+        except BaseException as e:
+            outcome["error"] = e
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    assert started.wait(5)
+    return release, thread, outcome
+
+
+def test_followers_share_one_call():
+    flight = SingleFlight()
+    calls = []
+    release, thread, leader = start_leader(flight)
+    results = []
+
+    def follower():
+        results.append(flight.do("k", lambda: calls.append(1)))
+
+    followers = [threading.Thread(target=follower) for _ in range(4)]
+    for t in followers:
+        t.start()
+    time.sleep(0.1)
+    release.set()
+    thread.join(5)
+    for t in followers:
+        t.join(5)
+
+    assert leader["value"] == ("result", False)
+    assert results == [("result", True)] * 4
+    assert calls == []
+    assert flight.in_flight() == 0
+
+
+def test_leader_exception_reaches_followers_and_releases_key():
+    flight = SingleFlight()
+    release, thread, leader = start_leader(flight, exc=ValueError("boom"))
+    errors = []
+
+    def follower():
+        try:
+            flight.do("k", lambda: "own")
+        except ValueError as e:
+            errors.append(e)
+
+    t = threading.Thread(target=follower)
+    t.start()
+    time.sleep(0.1)
+    release.set()
+    thread.join(5)
+    t.join(5)
+
+    assert isinstance(leader["error"], ValueError)
+    assert len(errors) == 1
+    assert flight.do("k", lambda: "fresh") == ("fresh", False)
+
+
+def test_follower_takes_over_when_leader_is_cancelled():
+    flight = SingleFlight()
+    release, thread, _ = start_leader(flight, exc=JobCancelled())
+    results = []
+    t = threading.Thread(target=lambda: results.append(flight.do("k", lambda: "own", retry_on=(JobCancelled,))))
+    t.start()
+    time.sleep(0.1)
+    release.set()
+    thread.join(5)
+    t.join(5)
+
+    assert results == [("own", False)]
+
+
+def test_cancelled_follower_does_not_retry_or_lead():
+    flight = SingleFlight()
+    release, thread, _ = start_leader(flight)
+    cancel = threading.Event()
+    calls = []
+    errors = []
+
+    def follower():
+        try:
+            flight.do("k", lambda: calls.append(1), cancel_event=cancel, retry_on=(JobCancelled,))
+        except JobCancelled as e:
+            errors.append(e)
+
+    t = threading.Thread(target=follower)
+    t.start()
+    time.sleep(0.1)
+    cancel.set()
+    t.join(2)
+    assert not t.is_alive()
+    release.set()
+    thread.join(5)
+
+    assert len(errors) == 1
+    assert calls == []
+
+
+def test_follower_timeout():
+    flight = SingleFlight()
+    release, thread, _ = start_leader(flight)
+    with pytest.raises(SingleFlightTimeout):
+        flight.do("k", lambda: "own", timeout=0.2)
+    release.set()
+    thread.join(5)
+
+
+def test_stale_call_is_not_joined():
+    flight = SingleFlight(stale_after=0.0)
+    release, thread, _ = start_leader(flight)
+    time.sleep(0.01)
+    assert flight.do("k", lambda: "own") == ("own", False)
+    release.set()
+    thread.join(5)
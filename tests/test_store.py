@@ -0,0 +1,67 @@
+import pytest
+
+from app.store import ProjectStore
+
+FILES = {
+    "proj/a/__init__.py": "",
+    "proj/b/__init__.py": "",
+    "proj/main.py": "print('hello')\n" * 100,
+    "proj/copy.py": "print('hello')\n" * 100,
+}
+
+
+def refs(store, path):
+    return store._blob_refs[store._blob_of[store.file_id(path)]]
+
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_behaves_like_the_dict_and_dedups(compress):
+    store = ProjectStore(FILES, compress=compress)
+    assert dict(store) == FILES
+    assert list(store) == list(FILES)
+    assert store.stats()["unique_contents"] == 2
+    assert refs(store, "proj/main.py") == 2
+
+
+def test_replacing_content_with_itself_changes_nothing():
+    store = ProjectStore(FILES)
+    before = store.stats()
+    assert store.update({"proj/main.py": FILES["proj/main.py"]}) == []
+    assert refs(store, "proj/main.py") == 2
+    assert store.stats() == before
+
+
+def test_replaced_content_is_released_once_unused():
+    store = ProjectStore(FILES)
+    assert store.update({"proj/main.py": "new"}) == ["proj/main.py"]
+    assert refs(store, "proj/copy.py") == 1
+    assert store.stats()["unique_contents"] == 3
+
+    store.update({"proj/copy.py": "new"})
+    assert refs(store, "proj/main.py") == 2
+    assert store.stats()["unique_contents"] == 2
+    assert store["proj/copy.py"] == "new"
+
+    # A released content that comes back gets a fresh blob
+    store.update({"proj/main.py": FILES["proj/main.py"]})
+    assert store["proj/main.py"] == FILES["proj/main.py"]
+    assert refs(store, "proj/main.py") == 1
+
+
+def test_removing_a_selected_file():
+    store = ProjectStore(FILES)
+    store.select_all()
+    store.remove(["proj/main.py", "proj/missing.py"])
+    assert "proj/main.py" not in store
+    assert len(store) == 3
+    assert store.selected_paths() == ["proj/a/__init__.py", "proj/b/__init__.py", "proj/copy.py"]
+    assert refs(store, "proj/copy.py") == 1
+
+    store.remove(["proj/copy.py"])
+    assert store.stats() == {"files": 2, "unique_contents": 1, "stored_bytes": 0}
+    assert store.selected_files() == {"proj/a/__init__.py": "", "proj/b/__init__.py": ""}
+
+    # The path can be added back; it is not selected again by itself
+    assert store.update({"proj/main.py": "again"}) == ["proj/main.py"]
+    assert list(store)[-1] == "proj/main.py"
+    assert "proj/main.py" not in store.selected_paths()
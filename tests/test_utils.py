@@ -0,0 +1,130 @@
+import json
+
+from app.utils import (RecordStreamParser, StreamingTreeParser, extract_json_object, flatten_structure, parse_ai_response,
+                       parse_records, validate_record)
+
+BLUEPRINT = {"proj": {"app.py": "print('{hi}')", "utils": {"helper.py": "x = \"}\"\n"}, "README.md": ""}}
+FILES = {"proj/app.py": "print('{hi}')", "proj/utils/helper.py": "x = \"}\"\n", "proj/README.md": ""}
+
+
+def test_parse_plain_json():
+    assert parse_ai_response(json.dumps(BLUEPRINT)) == FILES
+
+
+def test_parse_fenced_json_with_prose():
+    raw = "Sure! Here is {your} project:\n```json\n" + json.dumps(BLUEPRINT, indent=2) + "\n```\nEnjoy."
+    assert parse_ai_response(raw) == FILES
+
+
+def test_parse_retries_after_stray_brace_in_prose():
+    raw = "Use {braces} carefully. " + json.dumps(BLUEPRINT)
+    assert parse_ai_response(raw) == FILES
+
+
+def test_parse_slash_keys_and_skips_non_strings():
+    raw = json.dumps({"proj": {"src/app.py": "a", "./lib//x.py": "b", "list": [1, 2], "n": 3}})
+    assert parse_ai_response(raw) == {"proj/src/app.py": "a", "proj/lib/x.py": "b"}
+
+
+def test_parse_failures_return_none():
+    assert parse_ai_response("no json here") is None
+    assert parse_ai_response(None) is None
+
+
+def test_truncated_output_is_repaired_and_flagged():
+    raw = '{"proj": {"a.py": "print(1)", "b.py": "import os\\n'
+    status = {}
+    assert parse_ai_response(raw, status) == {"proj/a.py": "print(1)"}
+    assert status["truncated"] is True
+
+    # A literal value must not turn the next key into a cut point
+    status = {}
+    assert parse_ai_response('{"p": {"a.py": "x", "n": 1, "b.py"', status) == {"p/a.py": "x"}
+    assert parse_ai_response('{"p": {"a.py": "x", "n": null, "b.py": "y", "c.py"', status) == {"p/a.py": "x", "p/b.py": "y"}
+    assert status["truncated"] is True
+
+    status = {}
+    parse_ai_response(json.dumps(BLUEPRINT), status)
+    assert status["truncated"] is False
+
+
+def test_extract_json_object_is_string_aware():
+    raw = 'prefix {"a": "} { [", "b": {"c": "\\"}"}} suffix'
+    json_str, truncated = extract_json_object(raw)
+    assert not truncated
+    assert json.loads(json_str) == {"a": "} { [", "b": {"c": "\"}"}}
+    assert extract_json_object("nothing") == (None, False)
+
+
+def test_flatten_resolves_parent_references_inside_the_root():
+    assert flatten_structure({"proj": {"../../etc": {"passwd": "x"}}}) == {"etc/passwd": "x"}
+
+
+def test_flatten_deep_nesting_without_recursion():
+    structure = current = {}
+    for i in range(5000):
+        current[f"d{i}"] = current = {}
+    current["leaf.txt"] = "ok"
+    (path, content), = flatten_structure(structure).items()
+    assert path.endswith("d4999/leaf.txt") and content == "ok"
+
+
+def feed_in_chunks(parser, raw, size):
+    completed = []
+    for i in range(0, len(raw), size):
+        completed.extend(parser.feed(raw[i:i + size]))
+    return completed
+
+
+def test_streaming_parser_matches_full_parse_for_any_chunking():
+    raw = "```json\n" + json.dumps({"proj": {"a.py": "s = \"\\\\n\\u00e9\"", "sub": {"b.py": "{}", "n": [1, {"x": "y"}]}}}) + "\n```"
+    expected = parse_ai_response(raw)
+    for size in (1, 2, 3, 7, len(raw)):
+        parser = StreamingTreeParser()
+        completed = feed_in_chunks(parser, raw, size)
+        assert dict(completed) == expected == parser.files
+        assert parser.done
+
+
+def test_streaming_parser_emits_files_before_the_object_closes():
+    parser = StreamingTreeParser()
+    assert parser.feed('{"proj": {"a.py": "one", "b.py": "tw') == [("proj/a.py", "one")]
+    assert parser.feed('o"}}') == [("proj/b.py", "two")]
+    assert parser.done
+
+
+RECORDS = (
+    '{"path": "proj/app.py", "content": "print(1)\\nprint(2)"}\n'
+    '```\n'
+    '{"path": "proj\\\\utils/../x.py", "content": null}\n'
+    '{"path": 5, "content": "bad"}\n'
+    '{"path": "proj/broken.py", "content": "unterminated\n'
+    '{"done": true}\n'
+    '{"path": "proj/after.py", "content": "ignored"}\n'
+)
+
+
+def test_record_parser_validates_each_line():
+    status = {}
+    assert parse_records(RECORDS, status) == {"proj/app.py": "print(1)\nprint(2)", "proj/x.py": ""}
+    assert status["truncated"] is False
+
+
+def test_record_stream_survives_any_chunking_and_truncation():
+    for size in (1, 5, len(RECORDS)):
+        parser = RecordStreamParser()
+        completed = feed_in_chunks(parser, RECORDS, size) + parser.finish()
+        assert dict(completed) == parse_records(RECORDS)
+        assert parser.rejected == 2 and parser.done
+
+    cut = RECORDS[:RECORDS.index("proj/broken.py")]
+    status = {}
+    assert parse_records(cut, status) == {"proj/app.py": "print(1)\nprint(2)", "proj/x.py": ""}
+    assert status["truncated"] is True
+
+
+def test_validate_record():
+    assert validate_record({"path": "/a//b.py", "content": "x"}) == ("a/b.py", "x")
+    assert validate_record({"path": "", "content": "x"}) is None
+    assert validate_record({"path": "a.py", "content": 3}) is None
+    assert validate_record(["a.py", "x"]) is None